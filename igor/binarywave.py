@@ -27,9 +27,13 @@
 
 from __future__ import absolute_import
 import array as _array
+import itertools as _itertools
+import logging as _logging
+import operator as _operator
 import struct as _struct
 import sys as _sys
 import types as _types
+from multiprocessing.pool import ThreadPool as _ThreadPool
 
 import numpy as _numpy
 
@@ -38,10 +42,13 @@ from .struct import Structure as _Structure
 from .struct import DynamicStructure as _DynamicStructure
 from .struct import Field as _Field
 from .struct import DynamicField as _DynamicField
+from .struct import ParseContext as _ParseContext
 from .util import assert_null as _assert_null
 from .util import byte_order as _byte_order
 from .util import need_to_reorder_bytes as _need_to_reorder_bytes
 from .util import checksum as _checksum
+from .util import read_buffer as _read_buffer
+from .util import BufferCursor as _BufferCursor
 
 
 # Numpy doesn't support complex integers by default, see
@@ -74,6 +81,13 @@ class StaticStringField (_DynamicField):
         d = self._normalize_string(wave_data[self.name])
         wave_data[self.name] = d
 
+    def unpack_bytes(self, buffer, byte_order):
+        if self.format == 'c':
+            # read the whole string at once, not one object per char
+            return bytes(buffer)
+        return super(StaticStringField, self).unpack_bytes(
+            buffer, byte_order)
+
     def _normalize_string(self, d):
         if isinstance(d, bytes):
             pass
@@ -272,14 +286,18 @@ class DynamicWaveDataField1 (_DynamicField):
     def pre_unpack(self, parents, data):
         full_structure = parents[0]
         wave_structure = parents[-1]
-        wave_header_structure = wave_structure.fields[1].format
+        wave_header_structure = self.context.field(
+            wave_structure.fields[1], copy=False).format.for_order(
+            self.context.byte_order)
         wave_data = self._get_structure_data(parents, data, wave_structure)
-        version = data['version']
-        bin_header = wave_data['bin_header']
-        wave_header = wave_data['wave_header']
+        self.setup_data(
+            data['version'], wave_data['bin_header'],
+            wave_data['wave_header'], wave_header_structure.size)
 
+    def setup_data(self, version, bin_header, wave_header, wave_header_size):
+        "Set ``count``, ``data_size``, ``shape`` and ``dtype`` from headers."
         self.count = wave_header['npnts']
-        self.data_size = self._get_size(bin_header, wave_header_structure.size)
+        self.data_size = self._get_size(bin_header, wave_header_size)
 
         type_ = TYPE_TABLE.get(wave_header['type'], None)
         if type_:
@@ -292,7 +310,7 @@ class DynamicWaveDataField1 (_DynamicField):
         # (e.g. int32).  It has no effect on our local complex
         # integers.
         self.dtype = _numpy.dtype(type_).newbyteorder(
-            wave_structure.byte_order)
+            self.context.byte_order)
         if (version == 3 and
             self.count > 0 and
             bin_header['formulaSize'] > 0 and
@@ -322,7 +340,7 @@ class DynamicWaveDataField1 (_DynamicField):
                 self.data_size, self.count, self.dtype.itemsize, self.dtype)
         else:
             assert self.data_size >= 0, (
-                bin_header['wfmSize'], wave_header_structure.size)
+                bin_header['wfmSize'], wave_header_size)
 
     def _get_size(self, bin_header, wave_header_size):
         return bin_header['wfmSize'] - wave_header_size - 16
@@ -331,6 +349,26 @@ class DynamicWaveDataField1 (_DynamicField):
         return (self.count,)
 
     def unpack(self, stream):
+        memmap = getattr(self.context, 'memmap', None)  # WaveParseContext
+        if memmap is not None and self.data_size > 0:
+            return self._unpack_memmap(stream, memmap)
+        native = getattr(self.context, 'native', False)
+        if self.dtype.kind == 'S':  # text wave
+            if getattr(self.context, 'out', None) is not None:
+                raise ValueError(
+                    'cannot load text wave data into an out array')
+        else:  # numeric wave
+            out = getattr(self.context, 'out', None)
+            pool = getattr(self.context, 'pool', None)
+            dtype = self.dtype.newbyteorder('=') if native else self.dtype
+            if out is None and pool is not None:
+                out = pool.get(dtype, self.shape)
+            if out is None and native and not isinstance(
+                    stream, _BufferCursor):
+                # swap after reading into our own array, not a bytes copy
+                out = _numpy.empty(self.shape, dtype=dtype, order='F')
+            if out is not None:
+                return self._unpack_into(stream, out)
         data_b = stream.read(self.data_size)
         try:
             data = _numpy.ndarray(
@@ -344,7 +382,124 @@ class DynamicWaveDataField1 (_DynamicField):
                 'could not reshape data from {} to {}'.format(
                     self.shape, data_b))
             raise
+        if native:
+            data = _to_native(data)
+        return data
+
+    def _unpack_memmap(self, stream, memmap):
+        """Map the wave data from ``memmap`` instead of reading it.
+
+        ``memmap`` is the file ``stream`` is reading from.  The data
+        starts at the current stream position, so skip over it and
+        return a read-only ``numpy.memmap``.
+        """
+        offset = stream.tell()
+        data = _numpy.memmap(
+            memmap, dtype=self.dtype, mode='r', offset=offset,
+            shape=tuple(self.shape), order='F')
+        stream.seek(offset + self.data_size)
+        return data
+
+    def _unpack_into(self, stream, out):
+        """Read the wave data into the preallocated array ``out``.
+
+        ``out`` must have the wave's shape and dtype, but may use a
+        different byte order, in which case the data is swapped in
+        place after reading.
+        """
+        shape = tuple(int(n) for n in self.shape)
+        if (tuple(out.shape) != shape or
+                out.dtype.newbyteorder('=') != self.dtype.newbyteorder('=')):
+            raise ValueError(
+                'cannot load {} wave data with shape {} into a {} array '
+                'with shape {}'.format(
+                    self.dtype, shape, out.dtype, out.shape))
+        if not (out.flags.f_contiguous and out.flags.writeable):
+            raise ValueError(
+                'out must be a writeable, Fortran-contiguous array')
+        size = stream.readinto(
+            out.reshape(-1, order='F').view(_numpy.uint8))
+        if size != self.data_size:
+            raise ValueError(
+                'not enough data for {} ({} < {})'.format(
+                    self, size, self.data_size))
+        if out.dtype != self.dtype:
+            _byteswap(out)
+        return out
+
+
+# Arrays over NATIVE_THREAD_SIZE bytes are byte swapped by up to
+# NATIVE_THREADS threads.
+NATIVE_THREADS = 4
+NATIVE_THREAD_SIZE = 1 << 24
+
+
+def _swap_threads(data):
+    return min(NATIVE_THREADS, data.nbytes // NATIVE_THREAD_SIZE)
+
+
+def _byteswap(data):
+    """Swap the bytes of the Fortran-contiguous ``data`` in place.
+
+    ``ndarray.byteswap`` holds the GIL, so large arrays are instead
+    swapped in threads by assigning blocks to a view of ``data`` with
+    the opposite byte order.
+
+    >>> import numpy
+    >>> data = numpy.array([1, 2], dtype='>i2')
+    >>> _byteswap(data).tolist()
+    [256, 512]
+    """
+    threads = _swap_threads(data)
+    if threads < 2:
+        data.byteswap(True)
+    else:
+        flat = data.reshape(-1, order='F')
+        _assign_blocks(flat.view(flat.dtype.newbyteorder()), flat, threads)
+    return data
+
+
+def _to_native(data):
+    """Return the Fortran-contiguous ``data`` in native byte order.
+
+    Writeable arrays are swapped in place and returned as native
+    views, read-only arrays are converted into new arrays.
+
+    >>> import numpy
+    >>> data = numpy.array([1, 2], dtype='>i2')
+    >>> native = _to_native(data)
+    >>> native.dtype.isnative, native.tolist(), native.base is data
+    (True, [1, 2], True)
+    """
+    dtype = data.dtype.newbyteorder('=')
+    if data.dtype == dtype:
         return data
+    if data.flags.writeable:
+        return _byteswap(data).view(dtype)
+    native = _numpy.empty(data.shape, dtype=dtype, order='F')
+    threads = _swap_threads(data)
+    if threads < 2:
+        native[...] = data
+    else:
+        _assign_blocks(
+            native.reshape(-1, order='F'), data.reshape(-1, order='F'),
+            threads)
+    return native
+
+
+def _assign_blocks(target, source, threads, block_size=1 << 20):
+    """Set ``target[:] = source`` in blocks of about ``block_size`` bytes.
+
+    Numpy converts the blocks without holding the GIL, so ``threads``
+    threads share the work.  Blocks of overlapping arrays are copied
+    through temporaries, so ``target`` may be a view of ``source``.
+    """
+    size = max(1, block_size // source.itemsize)
+
+    def assign(start):
+        target[start:start + size] = source[start:start + size]
+
+    _map(assign, range(0, len(source), size), threads)
 
 
 class DynamicWaveDataField5 (DynamicWaveDataField1):
@@ -450,6 +605,10 @@ class DynamicLabelsField (DynamicStringField):
     dimension labels are the labels for rows 0, 1, and 2. When Igor
     writes dimension labels to disk, it writes each dimension label as
     a C string (null-terminated) in a field of 32 bytes.
+
+    The labels of each dimension are returned as a list of bytes, or,
+    if the ``WaveParseContext`` has ``labels='array'``, as a
+    fixed-width bytes array.
     """
     _size_field = 'dimLabelsSize'
     _array_size_field = True
@@ -458,28 +617,61 @@ class DynamicLabelsField (DynamicStringField):
         wave_structure = parents[-1]
         wave_data = self._get_structure_data(parents, data, wave_structure)
         bin_header = wave_data['bin_header']
-        d = wave_data[self.name]
+        d = self._normalize_bytes(wave_data[self.name])
+        as_array = getattr(self.context, 'labels', 'list') == 'array'
         dim_labels = []
         start = 0
         for size in bin_header[self._size_field]:
             end = start + size
-            if end > start:
-                dim_data = d[start:end]
-                chunks = []
-                for i in range(size//32):
-                    chunks.append(dim_data[32*i:32*(i+1)])
-                labels = [b'']
-                for chunk in chunks:
-                    labels[-1] = labels[-1] + b''.join(chunk)
-                    if b'\x00' in chunk:
-                        labels.append(b'')
-                labels.pop(-1)
-                start = end
-            else:
-                labels = []
+            labels = _decode_labels(d[start:end])
+            start = end
+            if not as_array:
+                labels = labels.tolist()
             dim_labels.append(labels)
         wave_data[self.name] = dim_labels
 
+    def _normalize_bytes(self, d):
+        if isinstance(d, bytes):
+            return d
+        elif hasattr(d, 'tobytes'):
+            return d.tobytes()
+        return b''.join(d)
+
+
+def _decode_labels(data):
+    r"""Decode a block of 32 byte dimension label chunks.
+
+    Each label is a null-terminated C string padded to 32 bytes.  The
+    block is viewed as an ``(n, 32)`` array and, in the usual case of
+    labels that fit in one chunk, converted to a fixed-width bytes
+    array in a single step.  Labels spanning several chunks (or with
+    stray bytes after their null) take the slow path, which joins
+    chunks up to the next chunk containing a null and drops all nulls.
+
+    >>> _decode_labels(b'time'.ljust(32, b'\x00') + bytes(bytearray(32))
+    ...     ).tolist()
+    [b'time', b'']
+    >>> _decode_labels(b'a' * 32 + b'bc'.ljust(32, b'\x00')).tolist()
+    [b'aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaabc']
+    >>> _decode_labels(b'').tolist()
+    []
+    """
+    chunks = _numpy.frombuffer(
+        data, dtype=_numpy.uint8, count=len(data) // 32 * 32).reshape(-1, 32)
+    nulls = chunks == 0
+    after_null = _numpy.logical_or.accumulate(nulls, axis=1)
+    if nulls.any(axis=1).all() and not (after_null & ~nulls).any():
+        return chunks.copy().view('S32').reshape(-1)
+    labels = [b'']
+    for chunk in chunks:
+        chunk = chunk.tobytes()
+        labels[-1] = labels[-1] + chunk.replace(b'\x00', b'')
+        if b'\x00' in chunk:
+            labels.append(b'')
+    labels.pop(-1)
+    width = max([32] + [len(label) for label in labels])
+    return _numpy.array(labels, dtype='S{}'.format(width))
+
 
 class DynamicStringIndicesDataField (_DynamicField):
     """String indices used for text waves only
@@ -504,28 +696,100 @@ class DynamicStringIndicesDataField (_DynamicField):
         wave_structure = parents[-1]
         wave_data = self._get_structure_data(parents, data, wave_structure)
         wave_header = wave_data['wave_header']
-        wdata = wave_data['wData']
-        strings = []
-        start = 0
-        for i,offset in enumerate(wave_data['sIndices']):
-            if offset > start:
-                chars = wdata[start:offset]
-                strings.append(b''.join(chars))
-                start = offset
-            elif offset == start:
-                strings.append(b'')
-            else:
-                raise ValueError((offset, wave_data['sIndices']))
-        wdata = _numpy.array(strings)
         shape = [n for n in wave_header['nDim'] if n > 0] or (0,)
+        strings = TextWaveData(
+            wave_data['wData'].tobytes(), wave_data['sIndices'], shape)
+        text = getattr(self.context, 'text', 'S')  # WaveParseContext
+        if text != 'lazy':
+            strings = strings.to_array(dtype=text)
+        wave_data['wData'] = strings
+
+
+class TextWaveData (object):
+    r"""The strings of a text wave, stored as one buffer and end offsets.
+
+    ``buffer`` holds the concatenated strings and ``offsets`` the end
+    offset of each string in ``buffer`` (the ``sIndices`` of the
+    wave), in file order.  Items are sliced out of ``buffer`` on
+    access, and ``.to_array`` converts all of them at once.
+
+    >>> strings = TextWaveData(b'abcdefg', [1, 1, 4, 7], shape=(2, 2))
+    >>> len(strings)
+    4
+    >>> list(strings)
+    [b'a', b'', b'bcd', b'efg']
+    >>> strings[-1]
+    b'efg'
+    >>> strings.to_array().tolist()
+    [[b'a', b'bcd'], [b'', b'efg']]
+    >>> a = strings.to_array(dtype='O')
+    >>> a.dtype == object, a.shape
+    (True, (2, 2))
+    >>> TextWaveData(b'abc', [2, 1], shape=(2,))
+    Traceback (most recent call last):
+      ...
+    ValueError: (1, array([2, 1]))
+    """
+    def __init__(self, buffer, offsets, shape):
+        self.buffer = buffer
+        self.offsets = _numpy.asarray(offsets)
+        self.shape = tuple(shape)
+        self.starts = _numpy.concatenate(([0], self.offsets[:-1]))
+        decreasing = self.offsets < self.starts
+        if decreasing.any():
+            raise ValueError(
+                (int(self.offsets[_numpy.argmax(decreasing)]), self.offsets))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        return self.buffer[self.starts[index]:self.offsets[index]]
+
+    def __iter__(self):
+        for start,end in zip(self.starts.tolist(), self.offsets.tolist()):
+            yield self.buffer[start:end]
+
+    def to_array(self, dtype='S'):
+        """Return the strings as an array with the wave's shape.
+
+        Like numeric wave data, the strings are stored in Fortran
+        (column-major) order.  ``dtype`` is ``'S'`` for a fixed-width
+        bytes array, whose items (like all numpy bytes arrays) lose
+        trailing nulls, or ``'O'`` for an object array of the original
+        ``bytes``.
+        """
+        if dtype not in ('S', 'O'):
+            raise ValueError('dtype must be S or O, not {!r}'.format(dtype))
+        ends = _numpy.minimum(self.offsets, len(self.buffer))
+        starts = _numpy.minimum(self.starts, ends)
+        lengths = ends - starts
+        if dtype == 'O':
+            data = _numpy.empty(len(self), dtype=object)
+            data[:] = list(self)
+        else:
+            # scatter the bytes of each string into its fixed-width row
+            width = max(int(lengths.max()) if len(lengths) else 0, 1)
+            data = _numpy.zeros(len(self) * width, dtype=_numpy.uint8)
+            total = int(lengths.sum())
+            source = _numpy.frombuffer(
+                self.buffer, dtype=_numpy.uint8, count=int(ends[-1])
+                )[int(starts[0]):] if total else data[:0]
+            rows = _numpy.repeat(
+                _numpy.arange(len(self)) * width - starts, lengths)
+            data[rows + _numpy.arange(int(starts[0]), int(starts[0]) + total)
+                 ] = source
+            data = data.view('S{}'.format(width))
         try:
-            wdata = wdata.reshape(shape)
+            return data.reshape(self.shape, order='F')
         except ValueError:
             _LOG.error(
                 'could not reshape strings from {} to {}'.format(
-                    shape, wdata.shape))
+                    self.shape, data.shape))
             raise
-        wave_data['wData'] = wdata
+
+
+TEXT_FORMATS = ('S', 'O', 'lazy')
 
 
 class DynamicVersionField (_DynamicField):
@@ -536,53 +800,40 @@ class DynamicVersionField (_DynamicField):
         wave_structure = parents[-1]
         wave_data = self._get_structure_data(parents, data, wave_structure)
         version = wave_data['version']
-        if wave_structure.byte_order in '@=':
+        if self.context.byte_order in '@=':
             need_to_reorder_bytes = _need_to_reorder_bytes(version)
-            wave_structure.byte_order = _byte_order(need_to_reorder_bytes)
-            _LOG.debug(
-                'get byte order from version: {} (reorder? {})'.format(
-                    wave_structure.byte_order, need_to_reorder_bytes))
+            self.context.byte_order = _byte_order(need_to_reorder_bytes)
+            if _LOG.isEnabledFor(_logging.DEBUG):
+                _LOG.debug(
+                    'get byte order from version: {} (reorder? {})'.format(
+                        self.context.byte_order, need_to_reorder_bytes))
         else:
             need_to_reorder_bytes = False
 
-        old_format = wave_structure.fields[-1].format
-        if version == 1:
-            wave_structure.fields[-1].format = Wave1
-        elif version == 2:
-            wave_structure.fields[-1].format = Wave2
-        elif version == 3:
-            wave_structure.fields[-1].format = Wave3
-        elif version == 5:
-            wave_structure.fields[-1].format = Wave5
-        elif not need_to_reorder_bytes:
+        wave_field = self.context.field(wave_structure.fields[-1])
+        old_format = wave_field.format
+        new_format = WAVE_VERSIONS.get(version, None)
+        if new_format is None and not need_to_reorder_bytes:
             raise ValueError(
                 'invalid binary wave version: {}'.format(version))
 
-        if wave_structure.fields[-1].format != old_format:
-            _LOG.debug('change wave headers from {} to {}'.format(
-                    old_format, wave_structure.fields[-1].format))
-            wave_structure.setup()
-        elif need_to_reorder_bytes:
-            wave_structure.setup()
+        if new_format is not None and new_format != old_format:
+            if _LOG.isEnabledFor(_logging.DEBUG):
+                _LOG.debug('change wave headers from {} to {}'.format(
+                        old_format, new_format))
+            wave_field.format = new_format
+            wave_field.setup()
 
         # we might need to unpack again with the new byte order
         return need_to_reorder_bytes
 
 
 class DynamicWaveField (_DynamicField):
-    def post_unpack(self, parents, data):
-        return
-        raise NotImplementedError()  # TODO
-        checksum_size = bin.size + wave.size
-        wave_structure = parents[-1]
-        if version == 5:
-            # Version 5 checksum does not include the wData field.
-            checksum_size -= 4
-        c = _checksum(b, parents[-1].byte_order, 0, checksum_size)
-        if c != 0:
-            raise ValueError(
-                ('This does not appear to be a valid Igor binary wave file.  '
-                 'Error in checksum: should be 0, is {}.').format(c))
+    """The version-dependent rest of the wave.
+
+    The header checksum needs the raw header bytes, so it is verified
+    by the loaders (see ``verify`` in ``load``) rather than here.
+    """
 
 Wave1 = _DynamicStructure(
     name='Wave1',
@@ -634,22 +885,772 @@ Wave = _DynamicStructure(
         DynamicWaveField(Wave1, 'wave', help='The rest of the wave data.'),
         ])
 
+WAVE_VERSIONS = {
+    1: Wave1,
+    2: Wave2,
+    3: Wave3,
+    5: Wave5,
+    }
+
 
-def load(filename):
+class WaveParseContext (_ParseContext):
+    """A ``ParseContext`` with the binary wave loading options.
+
+    ``memmap`` is the file to map ``wData`` from (see ``load``).  The
+    other options are described in ``loads``.  Waves parsed with a
+    plain ``ParseContext`` use the defaults.
+    """
+    def __init__(self, byte_order='=', lazy=False, trace=None, memmap=None,
+                 text='S', labels='list', out=None, pool=None,
+                 native=False):
+        super(WaveParseContext, self).__init__(
+            byte_order=byte_order, lazy=lazy, trace=trace)
+        if text not in TEXT_FORMATS:
+            raise ValueError('text must be one of {}, not {!r}'.format(
+                    TEXT_FORMATS, text))
+        if labels not in ('list', 'array'):
+            raise ValueError('labels must be list or array, not {!r}'.format(
+                    labels))
+        if memmap is not None and (out is not None or pool is not None):
+            raise ValueError('cannot map wave data into an out array')
+        if memmap is not None and native:
+            raise ValueError('cannot byte swap mapped wave data')
+        self.memmap = memmap
+        self.text = text
+        self.labels = labels
+        self.out = out
+        self.pool = pool
+        self.native = native
+
+
+def load(filename, mmap=False, verify=False, **kwargs):
+    """Load a wave from a binary wave file.
+
+    ``filename`` may be a path or a stream object.  With
+    ``mmap=True``, ``wData`` is returned as a read-only
+    ``numpy.memmap`` of the file instead of being read into memory, so
+    huge waves open without reading their data (``filename`` must then
+    be a path or a real file object).  Text waves are still decoded
+    into their strings, which reads the mapped data.  See ``loads``
+    for ``verify`` and the other keyword arguments.
+    """
+    if mmap:
+        if hasattr(filename, 'read'):
+            return _load_stream(
+                filename, verify=verify, memmap=filename, **kwargs)
+        with open(filename, 'rb') as f:
+            return _load_stream(f, verify=verify, memmap=f, **kwargs)
     if hasattr(filename, 'read'):
-        f = filename  # filename is actually a stream object
-    else:
-        f = open(filename, 'rb')
+        # filename is actually a stream object
+        return _load_stream(filename, verify=verify, **kwargs)
+    with open(filename, 'rb') as f:
+        if (kwargs.get('out', None) is not None or
+                kwargs.get('pool', None) is not None):
+            # read the wave data straight into the array
+            return _load_stream(f, verify=verify, **kwargs)
+        # a writable buffer lets native=True swap the data in place
+        buffer = _read_buffer(f, writable=kwargs.get('native', False))
+    return loads(buffer, verify=verify, **kwargs)
+
+
+def _load_stream(stream, verify=False, **kwargs):
+    if verify:
+        _verify_stream_checksum(stream)
+    return Wave.unpack_stream(stream, context=WaveParseContext(**kwargs))
+
+
+def loads(buffer, offset=0, verify=False, **kwargs):
+    """Load a wave from an in-memory buffer.
+
+    ``buffer`` may be any object supporting the buffer protocol
+    (``bytes``, ``bytearray``, ``mmap.mmap``, ...).  Fields are
+    decoded from ``memoryview`` slices, so the wave data is not copied
+    out of ``buffer`` before it is converted into an array.
+
+    With ``verify=True``, check the header checksum before parsing and
+    raise ``ValueError`` if it is invalid.  This only sums the few
+    hundred header bytes, so it is cheap enough to leave on.
+
+    Other keyword arguments configure the ``WaveParseContext``:
+
+    * With ``lazy=True``, the binary and wave headers are returned as
+      ``LazyStructureData`` mappings, which only decode the fields you
+      actually access.
+    * Pass a ``ParseTrace`` as ``trace`` to record per-field offsets
+      and timings.
+    * ``text`` selects the ``wData`` of text waves: ``'S'`` (the
+      default) for a fixed-width bytes array, ``'O'`` for an object
+      array of ``bytes``, or ``'lazy'`` for a ``TextWaveData`` that
+      keeps the strings in a single buffer and slices them on access.
+      Multi-dimensional text waves are reshaped in column-major
+      order, like numeric data.  Earlier releases reshaped them in
+      row-major order, which put the strings in the wrong cells.
+    * ``labels`` selects the dimension ``labels`` of version 5 waves:
+      ``'list'`` (the default) for a list of bytes per dimension, or
+      ``'array'`` for a fixed-width bytes array per dimension.
+    * ``out`` is a preallocated array to read the ``wData`` of
+      numeric waves into, instead of allocating a new one.  It must
+      be writeable, Fortran-contiguous and match the wave's shape and
+      dtype, although its byte order may differ (the data is then
+      swapped in place).  Passing ``out`` for a text wave raises
+      ``ValueError``.
+    * ``pool`` is a ``util.BufferPool`` to take such arrays from.
+      ``release`` the ``wData`` back to the pool when you are done
+      with it to reuse it in later loads.  Text waves are decoded as
+      usual, without taking an array from the pool.
+    * With ``native=True``, the ``wData`` of numeric waves is returned
+      in native byte order.  If ``buffer`` is writable, the data is
+      byte swapped in place (modifying ``buffer``), otherwise it is
+      converted into a new array.  Large waves are swapped by several
+      threads (see ``NATIVE_THREADS``).
+    """
+    if verify:
+        _verify_checksum(buffer, offset)
+    data,size = Wave.unpack_from(
+        buffer, offset=offset, context=WaveParseContext(**kwargs))
+    return data
+
+
+def load_header(filename, verify=False):
+    """Load the headers of a binary wave file without reading its data.
+
+    ``filename`` may be a path or a stream object positioned at the
+    start of the wave.  Only the version, binary header and wave
+    header are read; ``wData`` and the optional sections (note,
+    formula, units, labels, string indices) are skipped.  Their sizes
+    are in the binary header (``noteSize``, ``formulaSize``, ...).
+    Returns a dict with:
+
+    * ``version``, ``bin_header`` and ``wave_header``, as in ``load``,
+    * ``byte_order``, the file's ``struct`` byte order character,
+    * ``data_offset``, the offset of ``wData`` from the start of the
+      wave, and ``data_size``, its size in bytes,
+    * ``dtype`` and ``shape`` (Fortran order) of ``wData``.  Text
+      waves have an ``S1`` dtype and one item per byte, because their
+      strings are only split by the (unread) string indices.
+
+    With ``verify=True``, the header checksum is checked as in
+    ``load``.
+    """
+    if hasattr(filename, 'read'):
+        if verify:
+            _verify_stream_checksum(filename)
+        return _load_header(filename)
+    with open(filename, 'rb') as f:
+        if verify:
+            _verify_stream_checksum(f)
+        return _load_header(f)
+
+
+def iter_chunks(filename, points_per_chunk):
+    """Iterate over a wave's data in chunks of ``points_per_chunk`` points.
+
+    ``filename`` may be a path or a stream object positioned at the
+    start of the wave.  The headers are read once (see
+    ``load_header``), then the data is read one chunk at a time, so
+    waves larger than memory can be processed.  Chunks are 1D arrays
+    with the file's dtype, holding consecutive points in Fortran (file)
+    order, so their concatenation is ``wData.ravel(order='F')``.  The
+    last chunk may be shorter.  Text waves are not supported.  Invalid
+    arguments and unreadable headers raise when ``iter_chunks`` is
+    called, not when the first chunk is read.
+    """
+    if points_per_chunk < 1:
+        raise ValueError(
+            'points_per_chunk must be positive, not {}'.format(
+                points_per_chunk))
+    if hasattr(filename, 'read'):
+        return _iter_chunks(filename, points_per_chunk)
+    f = open(filename, 'rb')
+    try:
+        return _iter_chunks(f, points_per_chunk, close=True)
+    except Exception:
+        f.close()
+        raise
+
+
+def _iter_chunks(stream, points_per_chunk, close=False):
+    """Read the headers of ``stream`` and return a chunk generator.
+
+    The headers are checked before returning, so errors are raised by
+    ``iter_chunks`` itself rather than on the first ``next()``.  With
+    ``close=True``, ``stream`` is closed when the generator finishes.
+    """
+    start = stream.tell()
+    header = _load_header(stream)
+    dtype = header['dtype']
+    if TYPE_TABLE.get(header['wave_header']['type'], None) is None:
+        raise ValueError('chunked reads are not supported for text waves')
+    remaining = header['data_size'] // dtype.itemsize
+    return _read_chunks(
+        stream, start + header['data_offset'], dtype, remaining,
+        points_per_chunk, close)
+
+
+def _read_chunks(stream, offset, dtype, remaining, points_per_chunk, close):
+    try:
+        stream.seek(offset)
+        while remaining > 0:
+            chunk = _numpy.empty(
+                min(points_per_chunk, remaining), dtype=dtype)
+            size = stream.readinto(chunk.view(_numpy.uint8))
+            if size != chunk.nbytes:
+                raise ValueError(
+                    'unexpected end of binary wave file '
+                    '({} of {} bytes)'.format(size, chunk.nbytes))
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        if close:
+            stream.close()
+
+
+def load_stack(filenames, threads=None, verify=False):
+    """Load the data of many 1D waves with the same length and type.
+
+    Returns an ``(len(filenames), npnts)`` array in native byte order,
+    whose rows are the ``wData`` of each file.  ``filenames`` may mix
+    paths and stream objects positioned at the start of their waves.
+    The headers of all the files are read (see ``load_header``) and
+    checked for compatible numeric data first, then each file's data
+    is read straight into its row, without any intermediate arrays.
+    Set ``threads`` to read with a pool of that many threads.
+    """
+    filenames = list(filenames)
+    if not filenames:
+        raise ValueError('no binary wave files to stack')
+    starts = [filename.tell() if hasattr(filename, 'read') else 0
+              for filename in filenames]
+    headers = _map(
+        lambda filename: load_header(filename, verify=verify),
+        filenames, threads)
+    dtype = headers[0]['dtype']
+    shape = headers[0]['shape']
+    if len(shape) != 1 or dtype.kind == 'S':
+        raise ValueError(
+            'can only stack 1D numeric waves, not {} ({} data with shape {})'
+            .format(filenames[0], dtype, shape))
+    for filename,header in zip(filenames, headers):
+        if (header['shape'] != shape or
+                header['dtype'].newbyteorder('=') != dtype.newbyteorder('=')):
+            raise ValueError(
+                ('cannot stack {} ({} data with shape {}) with {} ({} data '
+                 'with shape {})').format(
+                    filename, header['dtype'], header['shape'],
+                    filenames[0], dtype, shape))
+    data = _numpy.empty(
+        (len(filenames), shape[0]), dtype=dtype.newbyteorder('='))
+
+    def read_row(i):
+        row = data[i]
+        if hasattr(filenames[i], 'read'):
+            size = _read_row(filenames[i], starts[i], headers[i], row)
+        else:
+            with open(filenames[i], 'rb') as f:
+                size = _read_row(f, starts[i], headers[i], row)
+        if size != row.nbytes:
+            raise ValueError(
+                'not enough data in {} ({} < {})'.format(
+                    filenames[i], size, row.nbytes))
+        if headers[i]['dtype'] != row.dtype:
+            _byteswap(row)
+
+    _map(read_row, range(len(filenames)), threads)
+    return data
+
+
+def _read_row(stream, start, header, row):
+    stream.seek(start + header['data_offset'])
+    return stream.readinto(row.view(_numpy.uint8))
+
+
+def _map(function, items, threads=None):
+    """Map ``function`` over ``items``, with a pool of ``threads`` threads.
+    """
+    if not threads:
+        return [function(item) for item in items]
+    pool = _ThreadPool(threads)
     try:
-        Wave.byte_order = '='
-        Wave.setup()
-        data = Wave.unpack_stream(f)
+        return pool.map(function, items)
     finally:
-        if not hasattr(filename, 'read'):
-            f.close()
+        pool.close()
+
 
+def _get_checksum_size(buffer, offset=0):
+    """Return the byte order and checksummed size of the wave at ``offset``.
+
+    ``buffer`` only needs to hold the wave's version field.
+    """
+    version, = _struct.unpack_from('=h', buffer, offset)
+    byte_order = _byte_order(_need_to_reorder_bytes(version))
+    version, = _struct.unpack_from(byte_order + 'h', buffer, offset)
+    wave_structure = WAVE_VERSIONS.get(version, None)
+    if wave_structure is None:
+        raise ValueError('invalid binary wave version: {}'.format(version))
+    size = 2 + sum(field.format.for_order(byte_order).size
+                   for field in wave_structure.fields[:2])
+    if version < 5:
+        # Versions 1 to 3 sum the in-file WaveHeader2, whose wData[4]
+        # covers the first 16 bytes of the data or padding.
+        size += 16
+    return (byte_order, size)
+
+
+def _verify_checksum(buffer, offset=0):
+    """Raise ``ValueError`` if the wave at ``offset`` has a bad checksum.
+    """
+    view = memoryview(buffer)[offset:]
+    if len(view) < 2:
+        size = 2  # not even a version field
+    else:
+        byte_order,size = _get_checksum_size(view)
+        view = view[:size]
+    if len(view) < size:
+        raise ValueError(
+            'unexpected end of binary wave file ({} of {} bytes)'.format(
+                len(view), size))
+    c = _checksum(view, byte_order, 0, size)
+    if c != 0:
+        raise ValueError(
+            ('This does not appear to be a valid Igor binary wave file.  '
+             'Error in checksum: should be 0, is {}.').format(c))
+
+
+def _verify_stream_checksum(stream):
+    """Like ``_verify_checksum``, but without moving ``stream``."""
+    start = stream.tell()
+    header = stream.read(2)
+    if len(header) == 2:
+        byte_order,size = _get_checksum_size(header)
+        header += stream.read(size - 2)
+    stream.seek(start)
+    _verify_checksum(header)
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError(
+            'unexpected end of binary wave file ({} of {} bytes)'.format(
+                len(data), size))
     return data
 
 
-def save(filename):
-    raise NotImplementedError
+def _load_header(stream):
+    version_format = Wave.fields[0].format
+    b = _read_exactly(stream, _struct.calcsize('=' + version_format))
+    version, = _struct.unpack('=' + version_format, b)
+    byte_order = _byte_order(_need_to_reorder_bytes(version))
+    version, = _struct.unpack(byte_order + version_format, b)
+    wave_structure = WAVE_VERSIONS.get(version, None)
+    if wave_structure is None:
+        raise ValueError('invalid binary wave version: {}'.format(version))
+    context = WaveParseContext(byte_order=byte_order)
+    bin_header_structure = wave_structure.fields[0].format.for_order(
+        byte_order)
+    bin_header = bin_header_structure.unpack_from(
+        _read_exactly(stream, bin_header_structure.size))
+    wave_header_structure = wave_structure.fields[1].format.for_order(
+        byte_order)
+    wave_header,size = wave_header_structure.unpack_from(
+        _read_exactly(stream, wave_header_structure.size), context=context)
+    data_field = context.field(wave_structure.fields[2])
+    data_field.setup_data(
+        version, bin_header, wave_header, wave_header_structure.size)
+    return {
+        'version': version,
+        'bin_header': bin_header,
+        'wave_header': wave_header,
+        'byte_order': byte_order,
+        'data_offset': len(b) + bin_header_structure.size + size,
+        'data_size': data_field.data_size,
+        'dtype': data_field.dtype,
+        'shape': tuple(int(n) for n in data_field.shape),
+        }
+
+
+# `load_data` reads through gaps of at most LOAD_DATA_GAP bytes between
+# selected points, and reads at most LOAD_DATA_READ_SIZE bytes at once.
+LOAD_DATA_GAP = 1 << 12
+LOAD_DATA_READ_SIZE = 1 << 20
+
+
+def load_data(filename, index=Ellipsis):
+    """Load part of a binary wave's data.
+
+    ``index`` is a basic numpy index (integers, slices and at most one
+    ``Ellipsis``) into ``wData``, and the result equals
+    ``load(filename)['wave']['wData'][index]``.  Only the headers and
+    the byte ranges covering the selected points are read: for each
+    selected combination of the outer dimensions, the selected rows.
+    When the leading dimensions are fully selected, consecutive
+    combinations are contiguous in the file and are read together.
+    With a ``step`` on the first dimension, rows less than
+    ``LOAD_DATA_GAP`` bytes apart are read together (dropping the
+    points between them), and rows further apart are read one point
+    at a time.  No single read is larger than ``LOAD_DATA_READ_SIZE``
+    bytes, unless one point is.  Text waves are not supported.
+    """
+    if hasattr(filename, 'read'):
+        return _load_data(filename, index)
+    with open(filename, 'rb') as f:
+        return _load_data(f, index)
+
+
+def _normalize_index(index, shape):
+    """Return one ``range`` per dimension and the dimensions to keep.
+
+    >>> ranges,keep = _normalize_index((Ellipsis, 2), (10, 4))
+    >>> [list(r) for r in ranges], keep
+    ([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [2]], [True, False])
+    >>> ranges,keep = _normalize_index(slice(None, None, 3), (10, 4))
+    >>> [list(r) for r in ranges], keep
+    ([[0, 3, 6, 9], [0, 1, 2, 3]], [True, True])
+    """
+    if not isinstance(index, tuple):
+        index = (index,)
+    if sum(1 for i in index if i is Ellipsis) > 1:
+        raise ValueError('an index can only have a single ellipsis')
+    if Ellipsis in index:
+        i = index.index(Ellipsis)
+        fill = (slice(None),) * (len(shape) - len(index) + 1)
+        index = index[:i] + fill + index[i+1:]
+    if len(index) > len(shape):
+        raise ValueError('too many indices for a {}-dimensional wave'.format(
+                len(shape)))
+    index = index + (slice(None),) * (len(shape) - len(index))
+    ranges = []
+    keep = []
+    for i,n in zip(index, shape):
+        if isinstance(i, slice):
+            ranges.append(range(*i.indices(n)))
+            keep.append(True)
+        else:
+            try:
+                i = _operator.index(i)
+            except TypeError:
+                raise ValueError('invalid wave data index: {!r}'.format(i))
+            if i < 0:
+                i += n
+            if not 0 <= i < n:
+                raise ValueError(
+                    'index {} is out of bounds for a dimension of size {}'
+                    .format(i, n))
+            ranges.append(range(i, i+1))
+            keep.append(False)
+    return (ranges, keep)
+
+
+def _load_data(stream, index):
+    start = stream.tell()
+    header = _load_header(stream)
+    if TYPE_TABLE.get(header['wave_header']['type'], None) is None:
+        raise ValueError('partial reads are not supported for text waves')
+    dtype = header['dtype']
+    shape = header['shape']
+    ranges,keep = _normalize_index(index, shape)
+    data = _numpy.empty(
+        shape=[len(r) for r in ranges], dtype=dtype, order='F')
+    if data.size:
+        ranges,shape = _merge_rows(ranges, shape)
+        merged = data.reshape([len(r) for r in ranges], order='F')
+        rows = ranges[0]
+        if rows.step < 0:
+            rows = rows[::-1]
+        groups = _row_groups(len(rows), rows.step, dtype.itemsize)
+        column = _numpy.empty(len(rows), dtype=dtype)
+        strides = [int(x) for x in _numpy.cumprod((1,) + shape[:-1])]
+        for out_index,in_index in zip(
+                _itertools.product(*[range(len(r)) for r in ranges[1:]]),
+                _itertools.product(*ranges[1:])):
+            offset = sum(
+                i * stride for i,stride in zip(in_index, strides[1:]))
+            for i,count in groups:
+                point = offset + rows[i]
+                stream.seek(
+                    start + header['data_offset'] + point * dtype.itemsize)
+                b = _read_exactly(
+                    stream, ((count - 1) * rows.step + 1) * dtype.itemsize)
+                column[i:i+count] = _numpy.frombuffer(
+                    b, dtype=dtype)[::rows.step]
+            if ranges[0].step < 0:
+                merged[(slice(None),) + out_index] = column[::-1]
+            else:
+                merged[(slice(None),) + out_index] = column
+    return data[tuple(slice(None) if k else 0 for k in keep)]
+
+
+def _merge_rows(ranges, shape):
+    """Merge leading dimensions whose selected points are contiguous.
+
+    While the rows cover a whole dimension, the rows of consecutive
+    indices in the next dimension follow each other in the file, so
+    that dimension is merged into the rows if its step is 1 (or it
+    has a single index).  Return the merged ranges and shape.
+
+    >>> ranges,shape = _merge_rows(
+    ...     [range(10), range(2, 5), range(0, 4, 2)], (10, 6, 4))
+    >>> ranges, shape
+    ([range(20, 50), range(0, 4, 2)], (60, 4))
+    >>> _merge_rows([range(0, 10, 2), range(6)], (10, 6))
+    ([range(0, 10, 2), range(0, 6)], (10, 6))
+    """
+    rows = ranges[0]
+    size = shape[0]
+    merged = 1
+    while (merged < len(ranges) and rows == range(size) and
+           (ranges[merged].step == 1 or len(ranges[merged]) == 1)):
+        r = ranges[merged]
+        rows = range(r[0] * size, (r[0] + len(r)) * size)
+        size *= shape[merged]
+        merged += 1
+    return ([rows] + list(ranges[merged:]), (size,) + tuple(shape[merged:]))
+
+
+def _row_groups(length, step, itemsize):
+    """Split ``length`` rows ``step`` points apart into separate reads.
+
+    Return ``(first row, row count)`` pairs.
+
+    >>> _row_groups(10, 1, 8)
+    [(0, 10)]
+    >>> _row_groups(4, 3, 8)
+    [(0, 4)]
+    >>> _row_groups(3, 1000, 8)
+    [(0, 1), (1, 1), (2, 1)]
+    >>> _row_groups(5, 1, LOAD_DATA_READ_SIZE // 2)
+    [(0, 2), (2, 2), (4, 1)]
+    """
+    if (step - 1) * itemsize > LOAD_DATA_GAP:
+        per_read = 1
+    else:
+        per_read = max(
+            1, (LOAD_DATA_READ_SIZE // itemsize - 1) // step + 1)
+    return [(i, min(per_read, length - i))
+            for i in range(0, length, per_read)]
+
+
+# Header values that have no field default and are not computed from
+# the wave data by `save`.
+_SAVE_DEFAULTS = {
+    'next': 0,
+    'creationDate': 0,
+    'modDate': 0,
+    'hsA': 1.0,
+    'hsB': 0.0,
+    'sfA': [1.0] * MAXDIMS,
+    'sfB': [0.0] * MAXDIMS,
+    'fsValid': 0,
+    'topFullScale': 0.0,
+    'botFullScale': 0.0,
+    'waveNoteH': 0,
+    }
+
+_TYPE_CODES = dict(
+    (_numpy.dtype(type_), code) for code,type_ in sorted(TYPE_TABLE.items())
+    if type_ is not None and code != 1)  # 1 is just the NT_CMPLX flag
+
+
+def save(filename, wave, byte_order='='):
+    """Save a wave to a binary wave file.
+
+    ``filename`` may be a path or a writable stream.  ``wave`` is a
+    dict shaped like the output of ``load``::
+
+      {'version': 5,
+       'wave': {'wave_header': {'bname': b'wave0', ...},
+                'wData': array, 'note': b'...', ...}}
+
+    Versions 5 (the default) and 2 are supported.  Only ``wData`` and
+    the wave name (``bname``) are required.  Sizes, ``npnts``,
+    ``type``, ``nDim`` and the checksum are computed from the data;
+    other header fields are taken from ``wave`` or default to zero
+    (one for the ``hsA`` and ``sfA`` scalings).  Text waves are saved
+    from arrays of ``bytes``.  Igor ends ``nDim`` at the first zero,
+    so empty waves must be 1D.  Version 5 waves may have the optional
+    ``formula``, ``note``, ``data_units``, ``dimension_units`` (bytes,
+    or one bytes per dimension) and ``labels`` (one list of labels per
+    dimension) sections; version 2 waves only have a ``note``.
+
+    The data is written in ``byte_order`` straight from the array's
+    buffer, which is only copied if it has to be converted to that
+    byte order or to Fortran order.
+    """
+    if hasattr(filename, 'write'):
+        _save(filename, wave, byte_order)
+        return
+    with open(filename, 'wb') as f:
+        _save(f, wave, byte_order)
+
+
+def _save(stream, wave, byte_order):
+    version = wave.get('version', 5)
+    if version not in (2, 5):
+        raise ValueError(
+            'can only save binary wave versions 2 and 5, not {}'.format(
+                version))
+    if byte_order in '@=':
+        byte_order = _byte_order(False)
+    wave_structure = WAVE_VERSIONS[version]
+    bin_header_structure = wave_structure.fields[0].format.for_order(
+        byte_order)
+    wave_header_structure = wave_structure.fields[1].format.for_order(
+        byte_order)
+    wave_data = wave['wave']
+    data,type_,shape,string_indices = _get_save_data(
+        wave_data['wData'], byte_order)
+    if string_indices is None:
+        string_indices = []
+
+    wave_header = dict(_SAVE_DEFAULTS)
+    wave_header.update(wave_data.get('wave_header', {}))
+    wave_header['npnts'] = int(_numpy.prod(shape))
+    wave_header['type'] = type_
+    bname = wave_header.get('bname', None)
+    max_name = MAX_WAVE_NAME5 if version == 5 else MAX_WAVE_NAME2
+    if not bname or len(bname) > max_name:
+        raise ValueError(
+            'wave names must have 1 to {} bytes, not {!r}'.format(
+                max_name, bname))
+    for field in wave_header_structure.fields:
+        if field.format == 'c':  # char fields default to integer zeros
+            wave_header.setdefault(
+                field.name, b'' if field.array else b'\x00')
+    for name in ['dataUnits', 'xUnits', 'dimUnits']:
+        if isinstance(wave_header.get(name, None), (list, tuple)):
+            wave_header[name] = b''.join(
+                [u.ljust(MAX_UNIT_CHARS+1, b'\x00')
+                 for u in wave_header[name]])
+
+    bin_header = {'checksum': 0, 'pictSize': 0}
+    sections = [wave_data.get('note', b'')]
+    bin_header['noteSize'] = len(sections[0])
+    if version == 5:
+        wave_header['nDim'] = list(shape) + [0] * (MAXDIMS - len(shape))
+        formula = wave_data.get('formula', b'')
+        data_units = wave_data.get('data_units', b'')
+        dim_units,dim_units_sizes = _get_dimension_units(wave_data)
+        labels,labels_sizes = _get_labels(wave_data.get('labels', []))
+        sections = [formula, sections[0], data_units, dim_units, labels]
+        bin_header.update({
+                'wfmSize': wave_header_structure.size + len(data),
+                'formulaSize': len(formula),
+                'dataEUnitsSize': len(data_units),
+                'dimEUnitsSize': dim_units_sizes,
+                'dimLabelsSize': labels_sizes,
+                'sIndicesSize': 4 * len(string_indices),
+                'optionsSize1': 0,
+                'optionsSize2': 0,
+                })
+        if len(string_indices):
+            sections.append(
+                string_indices.astype(byte_order + 'i4').tobytes())
+        checked = b''
+    else:
+        if type_ == 0 or len(shape) > 1:
+            raise ValueError(
+                'version 2 binary waves must hold 1D numeric data')
+        for name in ['formula', 'data_units', 'dimension_units']:
+            if wave_data.get(name, None):
+                raise ValueError(
+                    'version 2 binary waves cannot store {}'.format(name))
+        if any(wave_data.get('labels', [])):
+            raise ValueError(
+                'version 2 binary waves cannot store labels')
+        padding = bytes(bytearray(16))
+        sections.insert(0, padding)
+        bin_header['wfmSize'] = (
+            wave_header_structure.size + len(data) + len(padding))
+        # The version 1 to 3 checksum runs over the first 16 bytes of
+        # the data (filled with the padding if there is less data).
+        checked = (data[:16].tobytes() + padding)[:16]
+
+    header = bytearray(
+        2 + bin_header_structure.size + wave_header_structure.size)
+    _struct.pack_into(byte_order + 'h', header, 0, version)
+    _Structure.pack_into(bin_header_structure, header, 2, bin_header)
+    _Structure.pack_into(
+        wave_header_structure, header, 2 + bin_header_structure.size,
+        wave_header)
+    checksum = _checksum(
+        bytes(header) + checked, byte_order, 0, len(header) + len(checked))
+    checksum_offset = bin_header_structure.field_offsets['checksum'][0]
+    checksum = -checksum & 0xffff  # make the checked shorts sum to zero
+    if checksum >= 0x8000:
+        checksum -= 0x10000
+    _struct.pack_into(
+        byte_order + 'h', header, 2 + checksum_offset, checksum)
+    stream.write(header)
+    stream.write(data)
+    for section in sections:
+        stream.write(section)
+
+
+def _get_save_data(wdata, byte_order):
+    """Return the data bytes, type, shape and string indices to save.
+
+    The data bytes are a ``uint8`` array viewing the wave data in
+    Fortran order, to be written without further copies.
+    """
+    array = _numpy.asarray(wdata)
+    if array.ndim > MAXDIMS:
+        raise ValueError('waves can have at most {} dimensions, not {}'.format(
+                MAXDIMS, array.ndim))
+    if array.ndim > 1 and 0 in array.shape:
+        # Igor reads a zero in nDim as the end of the dimensions
+        raise ValueError(
+            'multi-dimensional waves cannot have empty dimensions, '
+            'not {}'.format(array.shape))
+    shape = array.shape or (1,)
+    flat = array.ravel(order='F')
+    if array.dtype.kind in 'SO':
+        strings = []
+        for item in flat:
+            if not isinstance(item, bytes):
+                raise ValueError(
+                    'text wave items must be bytes, not {!r}'.format(item))
+            strings.append(item)
+        data = _numpy.frombuffer(b''.join(strings), dtype=_numpy.uint8)
+        string_indices = _numpy.cumsum([len(s) for s in strings])
+        return (data, 0, shape, string_indices)
+    try:
+        type_ = _TYPE_CODES[array.dtype.newbyteorder('=')]
+    except KeyError:
+        raise ValueError('unsupported wave data type: {}'.format(array.dtype))
+    dtype = array.dtype.newbyteorder(byte_order)
+    if flat.dtype != dtype:
+        flat = flat.astype(dtype)
+    return (flat.view(_numpy.uint8), type_, shape, None)
+
+
+def _get_dimension_units(wave_data):
+    units = wave_data.get('dimension_units', b'')
+    if isinstance(units, bytes):
+        sizes = list(wave_data.get('bin_header', {}).get(
+                'dimEUnitsSize', [len(units)]))
+        if sum(sizes) != len(units):
+            sizes = [len(units)]
+    else:
+        sizes = [len(u) for u in units]
+        units = b''.join(units)
+    if len(sizes) > MAXDIMS:
+        raise ValueError('too many dimension units: {}'.format(sizes))
+    return (units, sizes + [0] * (MAXDIMS - len(sizes)))
+
+
+def _get_labels(labels):
+    """Pack dimension labels into null-terminated 32 byte chunks."""
+    if len(labels) > MAXDIMS:
+        raise ValueError('too many dimension label lists: {}'.format(
+                len(labels)))
+    chunks = []
+    sizes = []
+    for dim_labels in labels:
+        size = 0
+        for label in dim_labels:
+            label += b'\x00'
+            label = label.ljust(32 * -(-len(label) // 32), b'\x00')
+            chunks.append(label)
+            size += len(label)
+        sizes.append(size)
+    return (b''.join(chunks), sizes + [0] * (MAXDIMS - len(sizes)))
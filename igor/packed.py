@@ -17,11 +17,14 @@
 
 "Read IGOR Packed Experiment files files into records."
 
+import logging as _logging
+
 from . import LOG as _LOG
 from .struct import Structure as _Structure
 from .struct import Field as _Field
 from .util import byte_order as _byte_order
 from .util import need_to_reorder_bytes as _need_to_reorder_bytes
+from .util import read_buffer as _read_buffer
 from .util import _bytes
 from .record import RECORD_TYPE as _RECORD_TYPE
 from .record.base import UnknownRecord as _UnknownRecord
@@ -55,59 +58,87 @@ SUPERCEDED_MASK = 0x8000  # Bit is set if the record is superceded by
                           # a later record in the packed file.
 
 
-def load(filename, strict=True, ignore_unknown=True):
-    _LOG.debug('loading a packed experiment file from {}'.format(filename))
-    records = []
+def load(filename, strict=True, ignore_unknown=True, lazy=False,
+         verify=False, native=False):
+    if _LOG.isEnabledFor(_logging.DEBUG):
+        _LOG.debug(
+            'loading a packed experiment file from {}'.format(filename))
     if hasattr(filename, 'read'):
-        f = filename  # filename is actually a stream object
+        # filename is actually a stream object
+        buffer = _read_buffer(filename)
     else:
-        f = open(filename, 'rb')
+        with open(filename, 'rb') as f:
+            buffer = _read_buffer(f)
+    return loads(buffer, strict=strict, ignore_unknown=ignore_unknown,
+                 lazy=lazy, verify=verify, native=native)
+
+def loads(buffer, strict=True, ignore_unknown=True, lazy=False,
+          verify=False, native=False):
+    """Load a packed experiment from an in-memory buffer.
+
+    ``buffer`` may be any object supporting the buffer protocol
+    (``bytes``, ``bytearray``, ``mmap.mmap``, ...).  Wave and variable
+    records are parsed in place from ``memoryview`` slices of
+    ``buffer``, without copying their data.  With ``lazy=True``,
+    their headers are decoded on access (see ``binarywave.loads``).
+    With ``verify=True``, the wave header checksums are checked, and
+    with ``native=True``, wave data is converted to native byte order.
+    The converted data is always a new array, so ``buffer`` (and each
+    record's ``data``) keeps the bytes from the file.
+    """
+    records = []
+    buffer = memoryview(buffer)
+    offset = 0
     byte_order = None
     initial_byte_order = '='
     try:
-        while True:
-            PackedFileRecordHeader.byte_order = initial_byte_order
-            PackedFileRecordHeader.setup()
-            b = bytes(f.read(PackedFileRecordHeader.size))
-            if not b:
-                break
-            if len(b) < PackedFileRecordHeader.size:
+        while offset < len(buffer):
+            header_structure = PackedFileRecordHeader.for_order(
+                initial_byte_order)
+            if len(buffer) - offset < header_structure.size:
                 raise ValueError(
                     ('not enough data for the next record header ({} < {})'
-                     ).format(len(b), PackedFileRecordHeader.size))
+                     ).format(len(buffer) - offset, header_structure.size))
             _LOG.debug('reading a new packed experiment file record')
-            header = PackedFileRecordHeader.unpack_from(b)
+            header = header_structure.unpack_from(buffer, offset)
             if header['version'] and not byte_order:
                 need_to_reorder = _need_to_reorder_bytes(header['version'])
                 byte_order = initial_byte_order = _byte_order(need_to_reorder)
-                _LOG.debug(
-                    'get byte order from version: {} (reorder? {})'.format(
-                        byte_order, need_to_reorder))
-                if need_to_reorder:
-                    PackedFileRecordHeader.byte_order = byte_order
-                    PackedFileRecordHeader.setup()
-                    header = PackedFileRecordHeader.unpack_from(b)
+                if _LOG.isEnabledFor(_logging.DEBUG):
                     _LOG.debug(
-                        'reordered version: {}'.format(header['version']))
-            data = bytes(f.read(header['numDataBytes']))
+                        'get byte order from version: {} (reorder? {})'
+                        .format(byte_order, need_to_reorder))
+                if need_to_reorder:
+                    header_structure = PackedFileRecordHeader.for_order(
+                        byte_order)
+                    header = header_structure.unpack_from(buffer, offset)
+                    if _LOG.isEnabledFor(_logging.DEBUG):
+                        _LOG.debug('reordered version: {}'.format(
+                                header['version']))
+            offset += header_structure.size
+            data = buffer[offset:offset + header['numDataBytes']]
             if len(data) < header['numDataBytes']:
                 raise ValueError(
                     ('not enough data for the next record ({} < {})'
-                     ).format(len(b), header['numDataBytes']))
+                     ).format(len(data), header['numDataBytes']))
+            offset += len(data)
             record_type = _RECORD_TYPE.get(
                 header['recordType'] & PACKEDRECTYPE_MASK, _UnknownRecord)
-            _LOG.debug('the new record has type {} ({}).'.format(
-                    record_type, header['recordType']))
+            if _LOG.isEnabledFor(_logging.DEBUG):
+                _LOG.debug('the new record has type {} ({}).'.format(
+                        record_type, header['recordType']))
             if record_type in [_UnknownRecord, _UnusedRecord
                                ] and not ignore_unknown:
                 raise KeyError('unkown record type {}'.format(
                         header['recordType']))
-            records.append(record_type(header, data, byte_order=byte_order))
+            if not record_type.in_place:
+                data = data.tobytes()
+            records.append(record_type(
+                    header, data, byte_order=byte_order, lazy=lazy,
+                    verify=verify, native=native))
     finally:
-        _LOG.debug('finished loading {} records from {}'.format(
-                len(records), filename))
-        if not hasattr(filename, 'read'):
-            f.close()
+        if _LOG.isEnabledFor(_logging.DEBUG):
+            _LOG.debug('finished loading {} records'.format(len(records)))
 
     filesystem = _build_filesystem(records)
 
@@ -17,10 +17,18 @@
 
 
 class Record (object):
-    def __init__(self, header, data, byte_order=None):
+    # Record types that parse their data in place get a memoryview of
+    # the loaded file instead of a bytes copy.
+    in_place = False
+
+    def __init__(self, header, data, byte_order=None, lazy=False,
+                 verify=False, native=False):
         self.header = header
         self.data = data
         self.byte_order = byte_order
+        self.lazy = lazy
+        self.verify = verify
+        self.native = native
 
     def __str__(self):
         return self.__repr__()
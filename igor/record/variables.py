@@ -15,7 +15,10 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with igor.  If not, see <http://www.gnu.org/licenses/>.
 
-import io as _io
+import logging as _logging
+import struct as _struct
+
+import numpy as _numpy
 
 from .. import LOG as _LOG
 from ..binarywave import TYPE_TABLE as _TYPE_TABLE
@@ -25,6 +28,7 @@ from ..struct import Structure as _Structure
 from ..struct import DynamicStructure as _DynamicStructure
 from ..struct import Field as _Field
 from ..struct import DynamicField as _DynamicField
+from ..struct import ParseContext as _ParseContext
 from ..util import byte_order as _byte_order
 from ..util import need_to_reorder_bytes as _need_to_reorder_bytes
 from .base import Record
@@ -103,18 +107,117 @@ class DynamicSysVarField (DynamicVarDataField):
         return (name, value)
 
 
-class DynamicUserVarField (DynamicVarDataField):
-    def _normalize_item(self, index, value):
-        name = value['name']
-        value = value['num']
-        return (name, value)
-
+class VariablesParseContext (_ParseContext):
+    """A ``ParseContext`` with the variables record loading options.
 
-class DynamicUserStrField (DynamicVarDataField):
-    def _normalize_item(self, index, value):
-        name = value['name']
-        value = value['data']
-        return (name, value)
+    With ``columns=True``, user variables are returned as columns (see
+    ``ColumnarVarDataField``) instead of ``{name: value}`` dicts.
+    Records parsed with a plain ``ParseContext`` use dicts.
+    """
+    def __init__(self, byte_order='=', lazy=False, trace=None,
+                 columns=False):
+        super(VariablesParseContext, self).__init__(
+            byte_order=byte_order, lazy=lazy, trace=trace)
+        self.columns = columns
+
+
+class ColumnarVarDataField (DynamicVarDataField):
+    """Decode all of the variable records at once.
+
+    Instead of parsing each record as a separate ``DynamicStructure``
+    item, ``.unpack_columns`` reads the whole array into columns (one
+    list or array per record field), and ``.unpack`` converts them to
+    the usual ``{name: value}`` dict with ``.items_from_columns``, or
+    returns the columns themselves when parsing with a
+    ``VariablesParseContext`` with ``columns=True``.
+
+    Subclasses must define ``unpack_columns(stream, structure,
+    count)``, which reads ``count`` records of the byte-order specific
+    ``structure`` from ``stream`` and returns a dict of columns with
+    at least ``name`` and ``value``.
+    """
+    def unpack(self, stream):
+        structure = self.format.for_order(self.context.byte_order)
+        columns = self.unpack_columns(stream, structure, self.item_count)
+        if getattr(self.context, 'columns', False):  # VariablesParseContext
+            return columns
+        return self.items_from_columns(columns)
+
+    def items_from_columns(self, columns):
+        return dict(zip(columns['name'], columns['value']))
+
+    def _names(self, names):
+        "Convert a sequence of null-padded names to a list of bytes"
+        return [bytes(name).split(b'\x00', 1)[0] for name in names]
+
+
+class DynamicUserVarField (ColumnarVarDataField):
+    def unpack_columns(self, stream, structure, count):
+        """Return ``name``, ``type``, and ``value`` columns.
+
+        Numeric variable records have a fixed size, so the whole
+        array is decoded with a single ``numpy.frombuffer`` call.
+        """
+        size = structure.size * count
+        raw = stream.read(size)
+        if len(raw) < size:
+            raise ValueError(
+                'not enough data to unpack {}.{} ({} < {})'.format(
+                    structure, self, len(raw), size))
+        records = structure.unpack_array(raw, count=count)
+        num = records['num']
+        value = [
+            _normalize_numeric_variable(
+                {'numType': int(t), 'realPart': r, 'imagPart': i})
+            for t,r,i in zip(
+                num['numType'], num['realPart'], num['imagPart'])]
+        return {
+            'name': self._names(records['name']),
+            'type': records['type'],
+            'value': value,
+            }
+
+
+class DynamicUserStrField (ColumnarVarDataField):
+    def unpack_columns(self, stream, structure, count):
+        """Return ``name``, ``strLen``, and ``value`` columns.
+
+        Each record is a fixed-size head (name and ``strLen``)
+        followed by ``strLen`` bytes of data, so the records are
+        walked using the length prefixes.
+        """
+        name_field = structure.get_field('name')
+        length_field = structure.get_field('strLen')
+        data_field = structure.get_field('data')
+        byte_order = structure.byte_order
+        length_format = byte_order + length_field.format
+        head_size = name_field.item_count + _struct.calcsize(length_format)
+        names = []
+        lengths = []
+        value = []
+        for i in range(count):
+            head = stream.read(head_size)
+            if len(head) < head_size:
+                raise ValueError('not enough data to unpack {}.{}'.format(
+                        structure, self))
+            names.append(bytes(head[:name_field.item_count]))
+            length, = _struct.unpack_from(
+                length_format, head, name_field.item_count)
+            lengths.append(length)
+            if isinstance(data_field, ListedDynamicStrDataField):
+                size = max(length, 0)
+            else:  # a single character
+                size = _struct.calcsize(byte_order + data_field.format)
+            data = stream.read(size)
+            if len(data) < size:
+                raise ValueError('not enough data to unpack {}.{}'.format(
+                        structure, self))
+            value.append(bytes(data))
+        return {
+            'name': self._names(names),
+            'strLen': _numpy.array(lengths, dtype=int),
+            'value': value,
+            }
 
 
 class DynamicVarNumField (_DynamicField):
@@ -125,11 +228,15 @@ class DynamicVarNumField (_DynamicField):
         parent_data[-1][self.name] = d
 
     def _normalize_numeric_variable(self, num_var):
-        t = _TYPE_TABLE[num_var['numType']]
-        if num_var['numType'] % 2:  # complex number
-            return t(complex(num_var['realPart'], num_var['imagPart']))
-        else:
-            return t(num_var['realPart'])
+        return _normalize_numeric_variable(num_var)
+
+
+def _normalize_numeric_variable(num_var):
+    t = _TYPE_TABLE[num_var['numType']]
+    if num_var['numType'] % 2:  # complex number
+        return t(complex(num_var['realPart'], num_var['imagPart']))
+    else:
+        return t(num_var['realPart'])
 
 
 class DynamicFormulaField (_DynamicStringField):
@@ -216,23 +323,27 @@ class DynamicVarHeaderField (_DynamicField):
             parents, data, var_structure)
         var_header_structure = self.format
         data = var_data['var_header']
-        sys_vars_field = var_structure.get_field('sysVars')
+        sys_vars_field = self.context.field(
+            var_structure.get_field('sysVars'))
         sys_vars_field.count = data['numSysVars']
         sys_vars_field.setup()
-        user_vars_field = var_structure.get_field('userVars')
+        user_vars_field = self.context.field(
+            var_structure.get_field('userVars'))
         user_vars_field.count = data['numUserVars']
         user_vars_field.setup()
-        user_strs_field = var_structure.get_field('userStrs')
+        user_strs_field = self.context.field(
+            var_structure.get_field('userStrs'))
         user_strs_field.count = data['numUserStrs']
         user_strs_field.setup()
         if 'numDependentVars' in data:
-            dependent_vars_field = var_structure.get_field('dependentVars')
+            dependent_vars_field = self.context.field(
+                var_structure.get_field('dependentVars'))
             dependent_vars_field.count = data['numDependentVars']
             dependent_vars_field.setup()
-            dependent_strs_field = var_structure.get_field('dependentStrs')
+            dependent_strs_field = self.context.field(
+                var_structure.get_field('dependentStrs'))
             dependent_strs_field.count = data['numDependentStrs']
             dependent_strs_field.setup()
-        var_structure.setup()
 
 
 Variables1 = _DynamicStructure(
@@ -266,30 +377,34 @@ class DynamicVersionField (_DynamicField):
         variables_data = self._get_structure_data(
             parents, data, variables_structure)
         version = variables_data['version']
-        if variables_structure.byte_order in '@=':
+        if self.context.byte_order in '@=':
             need_to_reorder_bytes = _need_to_reorder_bytes(version)
-            variables_structure.byte_order = _byte_order(need_to_reorder_bytes)
-            _LOG.debug(
-                'get byte order from version: {} (reorder? {})'.format(
-                    variables_structure.byte_order, need_to_reorder_bytes))
+            self.context.byte_order = _byte_order(need_to_reorder_bytes)
+            if _LOG.isEnabledFor(_logging.DEBUG):
+                _LOG.debug(
+                    'get byte order from version: {} (reorder? {})'.format(
+                        self.context.byte_order, need_to_reorder_bytes))
         else:
             need_to_reorder_bytes = False
 
-        old_format = variables_structure.fields[-1].format
+        variables_field = self.context.field(variables_structure.fields[-1])
+        old_format = variables_field.format
         if version == 1:
-            variables_structure.fields[-1].format = Variables1
+            new_format = Variables1
         elif version == 2:
-            variables_structure.fields[-1].format = Variables2
+            new_format = Variables2
         elif not need_to_reorder_bytes:
             raise ValueError(
                 'invalid variables record version: {}'.format(version))
+        else:
+            new_format = None
 
-        if variables_structure.fields[-1].format != old_format:
-            _LOG.debug('change variables record from {} to {}'.format(
-                    old_format, variables_structure.fields[-1].format))
-            variables_structure.setup()
-        elif need_to_reorder_bytes:
-            variables_structure.setup()
+        if new_format is not None and new_format != old_format:
+            if _LOG.isEnabledFor(_logging.DEBUG):
+                _LOG.debug('change variables record from {} to {}'.format(
+                        old_format, new_format))
+            variables_field.format = new_format
+            variables_field.setup()
 
         # we might need to unpack again with the new byte order
         return need_to_reorder_bytes
@@ -304,16 +419,18 @@ VariablesRecordStructure = _DynamicStructure(
 
 
 class VariablesRecord (Record):
+    in_place = True
+
     def __init__(self, *args, **kwargs):
         super(VariablesRecord, self).__init__(*args, **kwargs)
         # self.header['version']  # record version always 0?
-        VariablesRecordStructure.byte_order = '='
-        VariablesRecordStructure.setup()
-        stream = _io.BytesIO(bytes(self.data))
-        self.variables = VariablesRecordStructure.unpack_stream(stream)
+        context = _ParseContext(byte_order='=', lazy=self.lazy)
+        self.variables,size = VariablesRecordStructure.unpack_from(
+            self.data, context=context)
         self.namespace = {}
         for key,value in self.variables['variables'].items():
             if key not in ['var_header']:
-                _LOG.debug('update namespace {} with {} for {}'.format(
-                        self.namespace, value, key))
+                if _LOG.isEnabledFor(_logging.DEBUG):
+                    _LOG.debug('update namespace {} with {} for {}'.format(
+                            self.namespace, value, key))
                 self.namespace.update(value)
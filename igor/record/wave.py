@@ -15,16 +15,24 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with igor.  If not, see <http://www.gnu.org/licenses/>.
 
-from io import BytesIO as _BytesIO
+import numpy as _numpy
 
-from ..binarywave import load as _loadibw
+from ..binarywave import loads as _loadsibw
 from . import Record
 
 
 class WaveRecord (Record):
+    in_place = True
+
     def __init__(self, *args, **kwargs):
         super(WaveRecord, self).__init__(*args, **kwargs)
-        self.wave = _loadibw(_BytesIO(bytes(self.data)))
+        data = self.data
+        if self.native:
+            # convert into new arrays instead of swapping self.data
+            data = _numpy.frombuffer(data, dtype=_numpy.uint8)
+            data.flags.writeable = False
+        self.wave = _loadsibw(
+            data, lazy=self.lazy, verify=self.verify, native=self.native)
 
     def __str__(self):
         return str(self.wave)
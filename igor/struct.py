@@ -24,14 +24,86 @@ with each field in a hierarchy of Python dictionaries.
 """
 
 from __future__ import absolute_import
-import io as _io
+import copy as _copy
+import hashlib as _hashlib
+import itertools as _itertools
 import logging as _logging
+import marshal as _marshal
+import os as _os
 import pprint as _pprint
 import struct as _struct
+import sys as _sys
+import time as _time
+try:
+    from collections.abc import MutableMapping as _MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping as _MutableMapping
 
 import numpy as _numpy
 
 from . import LOG as _LOG
+from .util import BufferCursor as _BufferCursor
+
+
+# High resolution timer for ParseTrace
+_timer = getattr(_time, 'perf_counter', _time.time)
+
+# Directory for caching compiled packing and unpacking code between
+# processes (see ``_compile_function``).  ``None`` disables the on-disk cache.
+CODE_CACHE = None
+
+# numpy kinds for ``struct`` format characters
+_NUMPY_KIND = {
+    'b': 'i', 'h': 'i', 'i': 'i', 'l': 'i', 'q': 'i',
+    'B': 'u', 'H': 'u', 'I': 'u', 'L': 'u', 'Q': 'u',
+    'P': 'u',  # see Structure.get_format
+    'e': 'f', 'f': 'f', 'd': 'f',
+    '?': 'b',
+    'c': 'S',
+    }
+
+# numpy types that ``numpy.array`` picks for the Python objects
+# returned by ``struct.unpack``, by numpy kind
+_UNPACKED_DTYPE = {
+    'i': _numpy.dtype(int),
+    'u': _numpy.dtype(int),
+    'f': _numpy.dtype(float),
+    'b': _numpy.dtype(bool),
+    'S': _numpy.dtype('S1'),
+    }
+
+# numpy byte order characters for ``struct`` byte orders
+_NUMPY_BYTE_ORDER = {
+    '@': '=',
+    '=': '=',
+    '<': '<',
+    '>': '>',
+    '!': '>',
+    }
+
+
+def _numpy_dtype(format, byte_order):
+    """Return the numpy dtype for a single ``struct`` format character.
+
+    >>> _numpy_dtype('l', '>')
+    dtype('>i4')
+    >>> _numpy_dtype('P', '>')
+    dtype('>u4')
+    >>> _numpy_dtype('c', '<')
+    dtype('S1')
+    >>> _numpy_dtype('x', '<')
+    Traceback (most recent call last):
+      ...
+    ValueError: no numpy equivalent for struct format x
+    """
+    try:
+        kind = _NUMPY_KIND[format]
+    except (KeyError, TypeError):
+        raise ValueError(
+            'no numpy equivalent for struct format {}'.format(format))
+    size = _struct.calcsize(byte_order + format.replace('P', 'I'))
+    return _numpy.dtype('{}{}{}'.format(
+            _NUMPY_BYTE_ORDER[byte_order], kind, size))
 
 
 class Field (object):
@@ -148,6 +220,8 @@ class Field (object):
     --------
     Structure
     """
+    context = None  # set on per-call copies, see ParseContext
+
     def __init__(self, format, name, default=None, help=None, count=1,
                  array=False):
         self.format = format
@@ -164,7 +238,8 @@ class Field (object):
         Use this method to recalculate dynamic properities after
         changing the basic properties set during initialization.
         """
-        _LOG.debug('setup {}'.format(self))
+        if _LOG.isEnabledFor(_logging.DEBUG):
+            _LOG.debug('setup {}'.format(self))
         self.item_count = _numpy.prod(self.count)  # number of item repeats
         if not self.array and self.item_count != 1:
             raise ValueError(
@@ -190,17 +265,13 @@ class Field (object):
         """Iterate through indexes to a possibly multi-dimensional array"""
         assert self.array, self
         try:
-            i = [0] * len(self.count)
+            ranges = [range(c) for c in self.count]
         except TypeError:  # non-iterable count
             for i in range(self.count):
                 yield i
         else:
-            for i in range(self.item_count):
-                index = []
-                for j,c in enumerate(reversed(self.count)):
-                    index.insert(0, i % c)
-                    i //= c
-                yield index
+            for index in _itertools.product(*ranges):
+                yield list(index)
 
     def pack_data(self, data=None):
         """Linearize a single field's data to a flat list.
@@ -255,7 +326,8 @@ class Field (object):
 
     def unpack_data(self, data):
         """Inverse of .pack_data"""
-        _LOG.debug('unpack {} for {} {}'.format(data, self, self.format))
+        if _LOG.isEnabledFor(_logging.DEBUG):
+            _LOG.debug('unpack {} for {} {}'.format(data, self, self.format))
         iterator = iter(data)
         try:
             items = [next(iterator) for i in range(self.arg_count)]
@@ -290,11 +362,51 @@ class Field (object):
                 raise NotImplementedError('reshape Structure field')
         else:
             unpacked = _numpy.array(unpacked)
-            _LOG.debug('reshape {} data from {} to {}'.format(
-                    self, unpacked.shape, count))
+            if _LOG.isEnabledFor(_logging.DEBUG):
+                _LOG.debug('reshape {} data from {} to {}'.format(
+                        self, unpacked.shape, count))
             unpacked = unpacked.reshape(count)
         return unpacked
 
+    def unpack_bytes(self, buffer, byte_order):
+        """Unpack a single field's data from a buffer.
+
+        Equivalent to running ``.unpack_data`` on the output of
+        ``struct.unpack``, but array fields with a primitive format
+        are decoded with a single ``numpy.frombuffer`` call instead of
+        going through a Python object for each item.
+
+        >>> data = Field('h', 'data', count=(2,3), array=True)
+        >>> b = bytes(bytearray(range(12)))
+        >>> data.unpack_bytes(b, '>')
+        array([[   1,  515, 1029],
+               [1543, 2057, 2571]])
+        >>> import numpy
+        >>> numpy.array_equal(data.unpack_bytes(b, '>'),
+        ...     data.unpack_data(data.unpack_struct(b, '>')))
+        True
+        """
+        try:
+            dtype = _numpy_dtype(self.format, byte_order)
+        except ValueError:
+            dtype = None
+        if dtype is not None and dtype.kind == 'u' and dtype.itemsize == 8:
+            dtype = None  # might not fit in _UNPACKED_DTYPE['u']
+        if dtype is None or not (self.array and self.arg_count):
+            return self.unpack_data(self.unpack_struct(buffer, byte_order))
+        unpacked_dtype = _UNPACKED_DTYPE[dtype.kind]
+        data = _numpy.frombuffer(buffer, dtype=dtype, count=self.item_count)
+        return data.astype(unpacked_dtype).reshape(self.count)
+
+    def unpack_struct(self, buffer, byte_order):
+        """Unpack a buffer into the flat list of ``struct`` items.
+        """
+        field_format = byte_order + self.format*self.item_count
+        field_format = field_format.replace('P', 'I')
+        if _LOG.isEnabledFor(_logging.DEBUG):
+            _LOG.debug('parse bytes using {}'.format(field_format))
+        return _struct.unpack(field_format, buffer)
+
     def unpack_item(self, item):
         """Inverse of .unpack_item"""
         if isinstance(self.format, Structure):
@@ -314,6 +426,12 @@ class DynamicField (Field):
     ``DynamicStructure``\s that own the field and ``data`` is a dict
     hierarchy of the structure data.
 
+    While unpacking, the unpack hooks are called on a per-call copy
+    of the field, so they may adjust ``self`` (e.g. ``self.count``)
+    without affecting the shared structure definition.  Use
+    ``self.context`` (a ``ParseContext``) to reach the per-call
+    copies of other fields or to change the parsing byte order.
+
     See the ``DynamicStructure`` docstring for the exact timing of the
     method calls.
 
@@ -342,7 +460,10 @@ class DynamicField (Field):
             return d
         for p in parents[1:]:
             for f in s.fields:
-                if f.format == p:
+                if self.context is not None:
+                    f = self.context.field(f, copy=False)
+                if (isinstance(f.format, Structure) and
+                        f.format._base is p._base):
                     s = p
                     d = d[f.name]
                     break
@@ -478,6 +599,25 @@ class Structure (_struct.Struct):
     >>> b2 = experiment2.pack(d)
     >>> b2 == b
     True
+
+    Instead of changing the byte order of a shared structure, you can
+    ask for a frozen variant.  Variants are built once per byte order
+    and cached, so parsers can pick the appropriate one without
+    recompiling any formats.
+
+    >>> little = experiment.for_order('<')
+    >>> little.get_format()
+    '<HIhhhhhhIhhhhhh'
+    >>> little is experiment.for_order('<')
+    True
+    >>> little.for_order('>') is experiment.for_order('>')
+    True
+    >>> little.get_field('runs').format.byte_order
+    '<'
+    >>> little.set_byte_order('>')  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+      ...
+    ValueError: cannot modify frozen structure <Structure experiment ...>
     """
     _byte_order_symbols = '@=<>!'
 
@@ -487,6 +627,9 @@ class Structure (_struct.Struct):
         self.name = name
         self.fields = fields
         self.byte_order = byte_order
+        self._base = self  # the structure frozen variants are built from
+        self._variants = {}
+        self._frozen = False
         self.setup()
 
     def __str__(self):
@@ -502,17 +645,32 @@ class Structure (_struct.Struct):
         Use this method to recalculate dynamic properities after
         changing the basic properties set during initialization.
         """
-        _LOG.debug('setup {!r}'.format(self))
+        if _LOG.isEnabledFor(_logging.DEBUG):
+            _LOG.debug('setup {!r}'.format(self))
+        self._check_mutable()
         self.set_byte_order(self.byte_order)
         self.get_format()
 
+    def _check_mutable(self):
+        if self._frozen:
+            raise ValueError(
+                'cannot modify frozen structure {!r}'.format(self))
+
     def set_byte_order(self, byte_order):
         """Allow changing the format byte_order on the fly.
+
+        See ``.for_order`` for a way to get structures with a
+        different byte order without changing shared definitions.
         """
-        _LOG.debug('set byte order for {!r} to {}'.format(self, byte_order))
+        if _LOG.isEnabledFor(_logging.DEBUG):
+            _LOG.debug('set byte order for {!r} to {}'.format(
+                    self, byte_order))
+        self._check_mutable()
         self.byte_order = byte_order
         for field in self.fields:
-            if isinstance(field.format, Structure):
+            if isinstance(field.format, Structure) and not (
+                    field.format._frozen and
+                    field.format.byte_order == byte_order):
                 field.format.set_byte_order(byte_order)
 
     def get_format(self):
@@ -524,10 +682,46 @@ class Structure (_struct.Struct):
             super(Structure, self).__init__(format=format)
         except _struct.error as e:
             raise ValueError((e, format))
+        self._unpack_plan = self._compile_unpack_plan()
+        self._unpacker = None  # compiled on first use
+        self._packer = None
+        self._field_map = self._compile_field_map()
+        self._dtype = None
+        self._lazy_layout = None
         return format
 
+    def for_order(self, byte_order):
+        """Return a frozen copy of this structure using ``byte_order``.
+
+        Variants are cached on the structure they were built from, so
+        the format compilation only happens the first time a given
+        byte order is requested.  Nested structures are replaced with
+        their own variants.  Fields are copied, so changing a field's
+        definition after the variant is built has no effect on the
+        variant.
+        """
+        if self._frozen and byte_order == self.byte_order:
+            return self
+        base = self._base
+        try:
+            return base._variants[byte_order]
+        except KeyError:
+            pass
+        fields = []
+        for field in base.fields:
+            field = _copy.copy(field)
+            if isinstance(field.format, Structure):
+                field.format = field.format.for_order(byte_order)
+            fields.append(field)
+        variant = base.__class__(
+            name=base.name, fields=fields, byte_order=byte_order)
+        variant._base = base
+        variant._frozen = True
+        return base._variants.setdefault(byte_order, variant)
+
     def sub_format(self):
-        _LOG.debug('calculate sub-format for {!r}'.format(self))
+        if _LOG.isEnabledFor(_logging.DEBUG):
+            _LOG.debug('calculate sub-format for {!r}'.format(self))
         for field in self.fields:
             if isinstance(field.format, Structure):
                 field_format = list(
@@ -537,6 +731,44 @@ class Structure (_struct.Struct):
             for fmt in field_format:
                 yield fmt
 
+    def _compile_unpack_plan(self):
+        """Map the flat argument tuple onto the nested data layout.
+
+        Returns ``(steps, arg_count)``, where each step is a ``(name,
+        kind, start, stop, extra)`` tuple.  ``start`` and ``stop`` are
+        argument indexes relative to the start of the structure.
+        ``extra`` is the reshape target for array fields and the
+        nested plan for structure fields.  The plan only depends on
+        the field layout, so it is compiled once in ``.get_format``
+        and reused by every ``._unpack_item`` call.
+        """
+        steps = []
+        start = 0
+        for f in self.fields:
+            stop = start + f.arg_count
+            if isinstance(f.format, Structure):
+                sub_plan = f.format._compile_unpack_plan()
+                if not f.array:
+                    kind = 'structure'
+                else:
+                    try:
+                        len(f.count)
+                    except TypeError:
+                        kind = 'structures'
+                    else:
+                        kind = 'reshaped structures'
+                steps.append((f.name, kind, start, stop, sub_plan))
+            elif f.array:
+                if f.arg_count:
+                    shape = f.count
+                else:
+                    shape = 0  # padding bytes, etc.
+                steps.append((f.name, 'array', start, stop, shape))
+            else:
+                steps.append((f.name, 'item', start, stop, None))
+            start = stop
+        return (steps, start)
+
     def _pack_item(self, item=None):
         """Linearize a single count of the structure's data to a flat iterable
         """
@@ -553,44 +785,240 @@ class Structure (_struct.Struct):
                 yield arg
 
     def _unpack_item(self, args):
-        """Inverse of ._unpack_item"""
-        data = {}
-        iterator = iter(args)
-        for f in self.fields:
-            try:
-                items = [next(iterator) for i in range(f.arg_count)]
-            except StopIteration:
-                raise ValueError('not enough data to unpack {}.{}'.format(
-                        self, f))
-            data[f.name] = f.unpack_data(items)
-        try:
-            next(iterator)
-        except StopIteration:
-            pass
-        else:
+        """Inverse of ._pack_item"""
+        if not hasattr(args, '__getitem__'):
+            args = tuple(args)
+        steps,arg_count = self._unpack_plan
+        if len(args) < arg_count:
+            raise ValueError('not enough data to unpack {}'.format(self))
+        elif len(args) > arg_count:
             raise ValueError('too much data to unpack {}'.format(self))
-        return data
+        if self._unpacker is None:
+            self._unpacker = _get_unpacker(steps)
+        return self._unpacker(args)
 
     def pack(self, data):
-        args = list(self._pack_item(data))
+        buffer = bytearray(self.size)
         try:
-            return super(Structure, self).pack(*args)
+            self.pack_into(buffer, 0, data)
         except:
             raise ValueError(self.format)
+        return bytes(buffer)
 
     def pack_into(self, buffer, offset=0, data={}):
-        args = list(self._pack_item(data))
-        return super(Structure, self).pack_into(
-            buffer, offset, *args)
+        r"""Pack ``data`` into a writable ``buffer`` starting at ``offset``.
+
+        The structure's bytes are zeroed, and then each field is
+        written at its ``.field_offsets`` position by code generated
+        for the structure's layout (see ``._get_packer``).  Array
+        fields are converted with numpy and copied in a single slice
+        assignment when possible, falling back to ``struct`` packing
+        of the ``.pack_data`` output (with defaults for missing items)
+        otherwise.
+
+        >>> import numpy
+        >>> point = Structure('point', fields=[
+        ...     Field('h', 'x'), Field('h', 'y', count=2, array=True)],
+        ...     byte_order='>')
+        >>> b = bytearray(b'\xff' * 8)
+        >>> point.pack_into(b, offset=1, data={
+        ...     'x': 1, 'y': numpy.array([2, 3])})
+        >>> b
+        bytearray(b'\xff\x00\x01\x00\x02\x00\x03\xff')
+
+        Values that do not fit the field's format raise ``ValueError``
+        (from ``struct``) instead of being silently converted.
+
+        >>> floats = Structure('floats', fields=[
+        ...     Field('f', 'x', count=2, array=True)], byte_order='>')
+        >>> floats.pack({'x': [1e300, 1.0]})
+        Traceback (most recent call last):
+          ...
+        ValueError: >ff
+        """
+        view = memoryview(buffer)
+        if view.ndim != 1 or view.itemsize != 1:
+            view = view.cast('B')
+        if len(view) < offset + self.size:
+            raise ValueError(
+                'not enough space to pack {} ({} < {})'.format(
+                    self, len(view) - offset, self.size))
+        view[offset:offset + self.size] = bytes(bytearray(self.size))
+        packer,fields = self._get_packer()
+        packer(self, fields, view, offset, data)
+
+    def _get_packer(self):
+        """Return the generated ``pack(structure, fields, view, offset,
+        item)`` function and the ``fields`` it indexes.
+
+        The function is straight-line code for our current layout (see
+        ``._pack_lines``), compiled with ``_compile_function``.
+        Consecutive scalar fields are packed with a single
+        ``struct.pack_into`` call.
+        """
+        if self._packer is None:
+            lines = ['def pack(structure, fields, view, offset, item):']
+            fields = []
+            self._pack_lines(self, '', 'item', lines, fields, '    ')
+            self._packer = (
+                _compile_function('pack', '\n'.join(lines) + '\n'),
+                tuple(fields))
+        return self._packer
+
+    def _pack_lines(self, structure, prefix, item, lines, fields, indent):
+        """Add the packing code for the ``structure`` fields to ``lines``.
+
+        ``item`` is the variable holding the structure's data and
+        ``prefix`` the ``._field_map`` prefix for its fields.  Fields
+        are appended to ``fields`` and referred to by index.
+        """
+        group = []  # (variable, format, offset, size) for packing together
+        def flush():
+            if group:
+                format = self.byte_order + ''.join(
+                    fmt for v,fmt,start,size in group)
+                lines.append(
+                    '{}_pack_into({!r}, view, offset + {}, {})'.format(
+                        indent, format, group[0][2],
+                        ', '.join(v for v,fmt,start,size in group)))
+                del group[:]
+        lines.extend([
+                '{}if {} is None:'.format(indent, item),
+                '{}    {} = {{}}'.format(indent, item),
+                ])
+        for f in structure.fields:
+            name = prefix + f.name
+            k = len(fields)
+            fields.append(f)
+            v = 'v{}'.format(k)
+            lines.extend([
+                    '{}try:'.format(indent),
+                    '{}    {} = {}[{!r}]'.format(indent, v, item, f.name),
+                    '{}except KeyError:'.format(indent),
+                    '{}    {} = None'.format(indent, v),
+                    '{}except TypeError:'.format(indent),
+                    '{}    raise ValueError(({!r}, {}))'.format(
+                        indent, f.name, item),
+                    ])
+            if isinstance(f.format, Structure):
+                if not f.array:
+                    self._pack_lines(
+                        f.format, name + '.', v, lines, fields, indent)
+                    continue
+                lines.extend([
+                        '{}if {} is None:'.format(indent, v),
+                        '{}    {} = []'.format(indent, v),
+                        ])
+                for i in range(f.item_count):
+                    x = '{}_{}'.format(v, i)
+                    lines.extend([
+                            '{}try:'.format(indent),
+                            '{}    {} = {}[{}]'.format(indent, x, v, i),
+                            '{}except IndexError:'.format(indent),
+                            '{}    {} = None'.format(indent, x),
+                            ])
+                    self._pack_lines(
+                        f.format, '{}.{}.'.format(name, i), x, lines, fields,
+                        indent)
+                continue
+            if not f.arg_count:
+                continue  # padding bytes, etc.
+            start = self._field_map[name][1]
+            if f.array:
+                lines.append(
+                    '{}structure._pack_field('
+                    'view, offset + {}, fields[{}], {})'.format(
+                        indent, start, k, v))
+                continue
+            lines.extend([
+                    '{}if {} is None:'.format(indent, v),
+                    '{}    {} = _pack_default(fields[{}])'.format(
+                        indent, v, k),
+                    ])
+            fmt = f.format.replace('P', 'I')
+            size = _struct.calcsize(self.byte_order + fmt)
+            if self.byte_order == '@' or (
+                    group and group[-1][2] + group[-1][3] != start):
+                flush()  # native alignment is relative to the format start
+            group.append((v, fmt, start, size))
+        flush()
+
+    def _pack_field(self, view, start, field, data):
+        """Write the data for a primitive ``field`` at ``start``.
+        """
+        if field.array and data is not None:
+            raw = self._pack_array_bytes(field, data)
+            if raw is not None:
+                view[start:start + len(raw)] = raw
+                return
+        field_format = self.byte_order + field.format*field.item_count
+        _struct.pack_into(
+            field_format.replace('P', 'I'), view, start,
+            *field.pack_data(data))
+
+    def _pack_array_bytes(self, field, data):
+        """Convert array field ``data`` to packed bytes with numpy.
+
+        Returns ``None`` if the data does not fill the field exactly,
+        or cannot be converted without loss, in which case the caller
+        falls back to ``struct`` packing.  Short ``c`` bytes are padded
+        with the field's default, like short lists, or with zeros if
+        the default is null (``None``, ``0`` or ``b'\\x00'``).
+
+        >>> s = Structure(name='s', fields=[
+        ...     Field('c', 'c', count=4, array=True, default=b'z')])
+        >>> s.pack({'c': b'ab'}) == s.pack({'c': [b'a', b'b']}) == b'abzz'
+        True
+        """
+        if field.format == 'c' and isinstance(data, bytes):
+            if len(data) > field.item_count:
+                return None
+            if field.default in (None, 0, b'\x00'):
+                return data  # remaining bytes are already zeroed
+            if not isinstance(field.default, bytes):
+                return None  # let struct complain about the default
+            return data + field.default * (field.item_count - len(data))
+        try:
+            dtype = _numpy_dtype(field.format, self.byte_order)
+        except ValueError:
+            return None
+        try:
+            array = _numpy.asarray(data)
+        except ValueError:  # ragged nesting
+            return None
+        if array.dtype == object or array.size != field.item_count:
+            return None
+        if dtype.kind == 'S':
+            if array.dtype.kind != 'S' or array.dtype.itemsize != 1:
+                return None
+        elif array.dtype.kind not in 'iufb':
+            return None
+        if not hasattr(data, 'flat') and (
+                array.shape != _numpy.empty(field.count).shape):
+            return None  # mis-shaped nested lists index differently
+        try:
+            with _numpy.errstate(over='ignore', invalid='ignore'):
+                converted = array.astype(dtype)
+        except (TypeError, ValueError):
+            return None
+        if dtype.kind in 'iub' and not (
+                array.dtype.kind in 'iub' and
+                _numpy.array_equal(converted, array)):
+            return None  # let struct complain about invalid values
+        if dtype.kind == 'f' and (
+                _numpy.isfinite(array) & ~_numpy.isfinite(converted)).any():
+            return None  # let struct complain about overflowing values
+        return converted.tobytes()
 
     def unpack(self, *args, **kwargs):
         args = super(Structure, self).unpack(*args, **kwargs)
         return self._unpack_item(args)
 
     def unpack_from(self, buffer, offset=0, *args, **kwargs):
-        _LOG.debug(
-            'unpack {!r} for {!r} ({}, offset={}) with {} ({})'.format(
-                buffer, self, len(buffer), offset, self.format, self.size))
+        if _LOG.isEnabledFor(_logging.DEBUG):
+            _LOG.debug(
+                'unpack {!r} for {!r} ({}, offset={}) with {} ({})'.format(
+                    buffer, self, len(buffer), offset, self.format, self.size))
         args = super(Structure, self).unpack_from(
             buffer, offset, *args, **kwargs)
         return self._unpack_item(args)
@@ -598,6 +1026,637 @@ class Structure (_struct.Struct):
     def get_field(self, name):
         return [f for f in self.fields if f.name == name][0]
 
+    def _leaf_offsets(self):
+        """Return the byte offset of each ``.sub_format`` item.
+
+        With native ``@`` ordering, each item is aligned to its own
+        size, which is what ``struct`` does for the flattened format.
+        """
+        offsets = []
+        offset = 0
+        for fmt in self.sub_format():
+            size = _struct.calcsize(self.byte_order + fmt.replace('P', 'I'))
+            if self.byte_order == '@' and offset % size:
+                offset += size - offset % size
+            offsets.append(offset)
+            offset += size
+        return offsets
+
+    def _map_fields(self, field_map, prefix, leaf_offsets, leaf_sizes,
+                    index=0, end=0):
+        """Add ``{name: (field, offset)}`` entries for our fields.
+
+        ``index`` is the index of our first item in ``leaf_offsets``
+        and ``end`` is the offset just past the previous item.
+        Returns the updated ``(index, end)``.
+        """
+        for f in self.fields:
+            name = prefix + f.name
+            if f.item_count and index < len(leaf_offsets):
+                field_map[name] = (f, leaf_offsets[index])
+            else:
+                field_map[name] = (f, end)
+            if isinstance(f.format, Structure):
+                for i in range(f.item_count):
+                    if f.array:
+                        item_prefix = '{}.{}.'.format(name, i)
+                    else:
+                        item_prefix = name + '.'
+                    index,end = f.format._map_fields(
+                        field_map, item_prefix, leaf_offsets, leaf_sizes,
+                        index, end)
+            elif f.item_count:
+                index += f.item_count
+                end = leaf_offsets[index - 1] + leaf_sizes[index - 1]
+        return (index, end)
+
+    def _compile_field_map(self):
+        leaf_offsets = self._leaf_offsets()
+        leaf_sizes = [
+            _struct.calcsize(self.byte_order + fmt.replace('P', 'I'))
+            for fmt in self.sub_format()]
+        field_map = {}
+        self._map_fields(field_map, '', leaf_offsets, leaf_sizes)
+        return field_map
+
+    @property
+    def field_offsets(self):
+        """Map field names to ``(offset, format, count)``.
+
+        Offsets are in bytes from the start of the structure, and
+        include any alignment padding.  Fields of nested structures
+        are listed under dotted names, with the item index for arrays
+        of structures.  For a ``DynamicStructure``, the offsets reflect
+        the current field definitions.
+
+        >>> run = Structure('run', fields=[
+        ...     Field('B', 'flag'),
+        ...     Field('I', 'time')])
+        >>> experiment = Structure('experiment', fields=[
+        ...     Field('H', 'version'),
+        ...     Field(run, 'runs', count=2, array=True)],
+        ...     byte_order='@')
+        >>> offsets = experiment.field_offsets
+        >>> [(name, offsets[name][0]) for name in sorted(offsets)]
+        ...     # doctest: +NORMALIZE_WHITESPACE
+        [('runs', 2), ('runs.0.flag', 2), ('runs.0.time', 4),
+         ('runs.1.flag', 8), ('runs.1.time', 12), ('version', 0)]
+        >>> offsets['runs.1.time'][1:]
+        ('I', 1)
+        """
+        return dict(
+            (name, (offset, f.format, f.count))
+            for name,(f,offset) in self._field_map.items())
+
+    def read_field(self, buffer, name, offset=0):
+        """Unpack a single field from a packed structure in ``buffer``.
+
+        ``name`` is a key of ``.field_offsets`` and ``offset`` is the
+        start of the structure in ``buffer``.  Only the bytes for that
+        field are decoded.  For a plain ``Field``, the result matches the
+        corresponding entry of ``.unpack_from(buffer, offset)``.  Fields
+        that override ``.unpack_bytes`` use their own decoding, but
+        ``DynamicField`` hooks are not called.
+
+        >>> point = Structure('point', fields=[
+        ...     Field('h', 'x'), Field('h', 'y', count=2, array=True)],
+        ...     byte_order='<')
+        >>> b = bytes(bytearray([0, 1, 0, 2, 0, 3, 0]))
+        >>> point.read_field(b, 'x', offset=1)
+        1
+        >>> point.read_field(b, 'y', offset=1).tolist()
+        [2, 3]
+        """
+        try:
+            f,start = self._field_map[name]
+        except KeyError:
+            raise ValueError('no field {} in {}'.format(name, self))
+        start += offset
+        if isinstance(f.format, Structure):
+            if f.array:
+                try:
+                    len(f.count)
+                except TypeError:
+                    pass
+                else:
+                    raise NotImplementedError('reshape Structure field')
+                prefixes = ['{}.{}.'.format(name, i)
+                            for i in range(f.item_count)]
+            else:
+                prefixes = [name + '.']
+            items = [
+                dict((sub.name, self.read_field(
+                            buffer, prefix + sub.name, offset=offset))
+                     for sub in f.format.fields)
+                for prefix in prefixes]
+            if f.array:
+                return items
+            return items[0]
+        stop = start + self._field_size(f)
+        if len(buffer) < stop:
+            raise ValueError(
+                'not enough data to read {}.{}'.format(self, name))
+        raw = buffer[start:stop]
+        if not f.array:
+            return f.unpack_struct(raw, self.byte_order)[0]
+        return f.unpack_bytes(raw, self.byte_order)
+
+    def _field_size(self, field):
+        field_format = self.byte_order + field.format*field.item_count
+        return _struct.calcsize(field_format.replace('P', 'I'))
+
+    def _lazy_field_layout(self):
+        """Return ``{name: (field, start, stop)}`` byte ranges, or ``None``.
+
+        Only structures whose fields all have a primitive format, a
+        fixed size, and no ``pre_unpack`` or ``unpack`` hooks can be
+        decoded one field at a time (see ``LazyStructureData``).
+        ``DynamicStructure.unpack_stream`` reads fields back to back,
+        so native ``@`` alignment is not supported.
+        """
+        if self._lazy_layout is None:
+            # build the layout before publishing it, so other threads
+            # never see a partial (or placeholder) layout
+            layout = False
+            if self.byte_order != '@' and not any(
+                    isinstance(f.format, Structure) or
+                    _overrides_hook(f, 'pre_unpack') or
+                    hasattr(f, 'unpack')
+                    for f in self.fields):
+                layout = {}
+                for f in self.fields:
+                    start = self._field_map[f.name][1]
+                    layout[f.name] = (f, start, start + self._field_size(f))
+            self._lazy_layout = layout
+        return self._lazy_layout or None
+
+    def to_dtype(self):
+        """Return a numpy structured dtype with the same memory layout.
+
+        Field offsets, alignment padding, and byte order match the
+        structure's ``struct`` format, so ``numpy.frombuffer`` can
+        decode packed instances directly (see ``.unpack_array``).
+        Padding bytes and empty fields are not included.
+
+        >>> import numpy
+        >>> run = Structure('run', fields=[
+        ...     Field('I', 'time'),
+        ...     Field('h', 'data', count=(2,3), array=True)])
+        >>> experiment = Structure('experiment', fields=[
+        ...     Field('H', 'version'),
+        ...     Field(run, 'runs', count=2, array=True)],
+        ...     byte_order='>')
+        >>> dtype = experiment.to_dtype()
+        >>> dtype.descr
+        [('version', '>u2'), ('runs', [('time', '>u4'), ('data', '>i2', (2, 3))], (2,))]
+        >>> dtype.itemsize == experiment.size
+        True
+
+        Native alignment is preserved:
+
+        >>> aligned = experiment.for_order('@').to_dtype()
+        >>> aligned.fields['runs'][1]
+        4
+        >>> aligned.itemsize == experiment.for_order('@').size
+        True
+        """
+        if self._dtype is None:
+            spec,index = self._dtype_spec(
+                self._leaf_offsets(), 0, self.byte_order)
+            names,formats,offsets = spec
+            self._dtype = _numpy.dtype({
+                    'names': names,
+                    'formats': formats,
+                    'offsets': offsets,
+                    'itemsize': self.size,
+                    })
+        return self._dtype
+
+    def _dtype_spec(self, leaf_offsets, index, byte_order):
+        """Return ``((names, formats, offsets), next_index)``.
+
+        ``index`` is the index of this structure's first item in
+        ``leaf_offsets``, and the returned offsets are absolute.
+        """
+        names = []
+        formats = []
+        offsets = []
+        for f in self.fields:
+            if isinstance(f.format, Structure):
+                items = []
+                for i in range(f.item_count):
+                    spec,index = f.format._dtype_spec(
+                        leaf_offsets, index, byte_order)
+                    if spec[0]:
+                        items.append(spec)
+                if not items:
+                    continue
+                starts = [min(item_offsets) for n,fmts,item_offsets in items]
+                relative = [
+                    (n, fmts, [o - start for o in item_offsets])
+                    for (n,fmts,item_offsets),start in zip(items, starts)]
+                strides = set(b - a for a,b in zip(starts, starts[1:]))
+                if len(strides) > 1 or any(r != relative[0] for r in relative):
+                    raise ValueError(
+                        'irregular layout for {}.{}'.format(self, f))
+                sub_names,sub_formats,sub_offsets = relative[0]
+                extent = max(
+                    o + _numpy.dtype(fmt).itemsize
+                    for o,fmt in zip(sub_offsets, sub_formats))
+                dtype = _numpy.dtype({
+                        'names': sub_names,
+                        'formats': sub_formats,
+                        'offsets': sub_offsets,
+                        'itemsize': strides.pop() if strides else extent,
+                        })
+                offset = starts[0]
+            elif f.format == 'x' or not f.item_count:
+                index += f.item_count
+                continue
+            else:
+                dtype = _numpy_dtype(f.format, byte_order)
+                offset = leaf_offsets[index]
+                index += f.item_count
+            if f.array:
+                try:
+                    shape = tuple(f.count)
+                except TypeError:
+                    shape = (f.count,)
+                dtype = (dtype, shape)
+            names.append(f.name)
+            formats.append(dtype)
+            offsets.append(offset)
+        return ((names, formats, offsets), index)
+
+    def unpack_array(self, buffer, count=1, offset=0):
+        """Decode ``count`` consecutive packed structures at once.
+
+        Returns a numpy structured array with the ``.to_dtype`` dtype.
+        Use ``._unpack_records`` to convert it to the nested-dict
+        format returned by ``.unpack_from``.
+
+        >>> point = Structure('point', fields=[
+        ...     Field('h', 'x'), Field('h', 'y')], byte_order='<')
+        >>> b = bytes(bytearray([1, 0, 2, 0, 3, 0, 4, 0]))
+        >>> points = point.unpack_array(b, count=2)
+        >>> points['x'].tolist()
+        [1, 3]
+        >>> point._unpack_records(points) == [
+        ...     point.unpack_from(b), point.unpack_from(b, offset=4)]
+        True
+        """
+        return _numpy.frombuffer(
+            buffer, dtype=self.to_dtype(), count=count, offset=offset)
+
+    def _unpack_records(self, records):
+        """Convert ``.unpack_array`` output to a list of data dicts.
+
+        The result matches what ``.unpack_from`` returns for each
+        record.
+        """
+        count = len(records)
+        items = [{} for i in range(count)]
+        names = records.dtype.names or ()
+        for f in self.fields:
+            if isinstance(f.format, Structure):
+                if f.name not in names:
+                    if f.array and not f.item_count:
+                        values = [[] for i in range(count)]
+                    else:
+                        raise NotImplementedError(
+                            'unpack empty Structure field {}'.format(f))
+                elif not f.array:
+                    values = f.format._unpack_records(records[f.name])
+                else:
+                    try:
+                        len(f.count)
+                    except TypeError:
+                        pass
+                    else:
+                        raise NotImplementedError('reshape Structure field')
+                    column = records[f.name]
+                    flat = f.format._unpack_records(column.reshape(-1))
+                    n = f.item_count
+                    values = [flat[i*n:(i+1)*n] for i in range(count)]
+            elif f.name not in names:
+                values = [_numpy.array([]).reshape(0) for i in range(count)]
+            elif f.array:
+                column = records[f.name]
+                kind = column.dtype.kind
+                if kind == 'u' and column.dtype.itemsize == 8:
+                    values = [_numpy.array(v.tolist()) for v in column]
+                else:
+                    column = column.astype(_UNPACKED_DTYPE[kind])
+                    values = list(column)
+            elif f.format == 'c':
+                raw = records[f.name].tobytes()
+                values = [raw[i:i+1] for i in range(count)]
+            else:
+                values = records[f.name].tolist()
+            for item,value in zip(items, values):
+                item[f.name] = value
+        return items
+
+
+def _overrides_hook(field, name):
+    """Return ``True`` if ``field`` has a non-trivial ``name`` hook.
+    """
+    method = getattr(type(field), name, None)
+    if method is None:
+        return False
+    default = getattr(DynamicField, name)
+    return (getattr(method, '__func__', method) is not
+            getattr(default, '__func__', default))
+
+
+def _run_unpack_plan(steps, args, offset):
+    """Build the nested data for a compiled ``Structure`` plan.
+
+    See ``Structure._compile_unpack_plan`` for the plan format.
+    """
+    data = {}
+    for name,kind,start,stop,extra in steps:
+        if kind == 'item':
+            data[name] = args[offset + start]
+        elif kind == 'array':
+            data[name] = _numpy.array(
+                args[offset + start:offset + stop]).reshape(extra)
+        elif kind == 'structure':
+            data[name] = _run_unpack_plan(extra[0], args, offset + start)
+        elif kind == 'structures':
+            sub_steps,size = extra
+            data[name] = [
+                _run_unpack_plan(sub_steps, args, i)
+                for i in range(offset + start, offset + stop, size or 1)]
+        else:
+            raise NotImplementedError('reshape Structure field')
+    return data
+
+
+def _unpack_source(steps, offset=0):
+    """Return a Python expression building the data for a plan.
+
+    The expression is the straight-line equivalent of
+    ``_run_unpack_plan(steps, args, offset)``, or ``None`` if the plan
+    contains steps that ``_run_unpack_plan`` does not support.
+    """
+    items = []
+    for name,kind,start,stop,extra in steps:
+        if kind == 'item':
+            value = 'args[{}]'.format(offset + start)
+        elif kind == 'array':
+            value = '_array(args[{}:{}])'.format(offset + start, offset + stop)
+            if _numpy.ndim(extra) or extra != stop - start:
+                value += '.reshape({!r})'.format(extra)
+        elif kind == 'structure':
+            value = _unpack_source(extra[0], offset + start)
+        elif kind == 'structures':
+            sub_steps,size = extra
+            values = [
+                _unpack_source(sub_steps, i)
+                for i in range(offset + start, offset + stop, size or 1)]
+            if None in values:
+                return None
+            value = '[{}]'.format(', '.join(values))
+        else:
+            return None
+        if value is None:
+            return None
+        items.append('{!r}: {}'.format(name, value))
+    return '{{{}}}'.format(', '.join(items))
+
+
+_GENERATED = {}  # in-process cache of generated functions by source hash
+
+
+def _get_unpacker(steps):
+    """Return a function mapping a flat argument tuple to nested data.
+
+    The function is generated from the plan (see ``_unpack_source``)
+    and compiled with ``_compile_function``.  Plans the generator does
+    not support fall back to ``_run_unpack_plan``.
+
+    >>> steps,arg_count = Structure('point', fields=[
+    ...     Field('h', 'x'), Field('h', 'y', count=2, array=True)]
+    ...     )._unpack_plan
+    >>> unpacker = _get_unpacker(steps)
+    >>> d = unpacker((1, 2, 3))
+    >>> (d['x'], d['y'].tolist())
+    (1, [2, 3])
+    """
+    expression = _unpack_source(steps)
+    if expression is None:
+        return lambda args: _run_unpack_plan(steps, args, 0)
+    return _compile_function(
+        'unpack', 'def unpack(args):\n    return {}\n'.format(expression))
+
+
+def _compile_function(name, source):
+    """Return the function ``name`` defined by the generated ``source``.
+
+    Each distinct source is compiled once per process.  If
+    ``CODE_CACHE`` is set, the compiled code is also stored there,
+    keyed by the source hash and the interpreter's cache tag, so later
+    processes can skip compilation.  Generated code must not refer to
+    objects other than the helpers in its namespace, so functions with
+    the same source can be shared between structures.
+    """
+    key = _hashlib.sha1(source.encode('utf-8')).hexdigest()
+    try:
+        return _GENERATED[key]
+    except KeyError:
+        pass
+    code = _load_cached_code(name, key)
+    if code is None:
+        code = compile(
+            source, '<igor.struct {} {}>'.format(name, key), 'exec')
+        _store_cached_code(name, key, code)
+    namespace = {
+        '_array': _numpy.array,
+        '_pack_into': _struct.pack_into,
+        '_pack_default': _pack_default,
+        }
+    exec(code, namespace)
+    return _GENERATED.setdefault(key, namespace[name])
+
+
+def _code_cache_path(name, key):
+    cache_tag = getattr(
+        getattr(_sys, 'implementation', None), 'cache_tag', None
+        ) or 'python{}{}'.format(*_sys.version_info[:2])
+    return _os.path.join(
+        _os.path.expanduser(CODE_CACHE),
+        '{}-{}.{}.marshal'.format(name, key, cache_tag))
+
+def _load_cached_code(name, key):
+    if CODE_CACHE is None:
+        return None
+    try:
+        with open(_code_cache_path(name, key), 'rb') as f:
+            return _marshal.load(f)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+
+def _store_cached_code(name, key, code):
+    if CODE_CACHE is None:
+        return
+    path = _code_cache_path(name, key)
+    temp = '{}.{}.tmp'.format(path, _os.getpid())
+    try:
+        if not _os.path.isdir(_os.path.dirname(path)):
+            _os.makedirs(_os.path.dirname(path))
+        with open(temp, 'wb') as f:
+            _marshal.dump(code, f)
+        _os.rename(temp, path)
+    except (IOError, OSError) as e:
+        _LOG.debug('could not cache {} code in {}: {}'.format(name, path, e))
+
+
+def _pack_default(field):
+    """Return the default packed for a missing scalar ``field`` value.
+    """
+    if field.default is None:
+        raise ValueError('no default for {}'.format(field))
+    return field.default
+
+
+class ParseContext (object):
+    r"""Hold the per-call state of a ``DynamicStructure`` unpacking.
+
+    Dynamic fields need to adjust field definitions (counts, formats,
+    ...) and the byte order based on previously unpacked data.  To
+    keep the shared structure definitions immutable (and parsing
+    reentrant), that state lives in a ``ParseContext``.
+    ``DynamicStructure.unpack_stream`` works on per-call copies of
+    dynamic fields, and hooks can request copies of any other field
+    with ``.field``.  With ``lazy=True``, substructures with a static
+    layout are returned as ``LazyStructureData`` instead of being
+    fully unpacked.  Set ``trace`` to a ``ParseTrace`` to profile the
+    unpacking.
+
+    >>> count = Field('h', 'count', count=0, array=True)
+    >>> context = ParseContext(byte_order='>')
+    >>> c = context.field(count)
+    >>> c is count
+    False
+    >>> c.context is context
+    True
+    >>> c.count = 3
+    >>> c.setup()
+    >>> (count.count, context.field(count).count)
+    (0, 3)
+    >>> context.field(Field('h', 'other'), copy=False).context is None
+    True
+    """
+    def __init__(self, byte_order='=', lazy=False, trace=None):
+        self.byte_order = byte_order
+        self.lazy = lazy
+        self.trace = trace
+        self._fields = {}
+
+    def field(self, field, copy=True):
+        """Return the per-call copy of ``field``.
+
+        If ``copy`` is ``False`` and there is no per-call copy, return
+        the original ``field`` instead of creating a new copy.
+        """
+        try:
+            return self._fields[field]
+        except KeyError:
+            if not copy:
+                return field
+        clone = _copy.copy(field)
+        clone.context = self
+        self._fields[field] = clone
+        return clone
+
+
+class LazyStructureData (_MutableMapping):
+    r"""Structure data decoded from the packed bytes on first access.
+
+    A dict-like stand-in for the output of ``Structure.unpack_from``
+    for structures with a static layout (see
+    ``Structure._lazy_field_layout``).  Each field is decoded
+    (including any ``post_unpack`` normalization) the first time it
+    is accessed, and the result is cached.
+
+    >>> point = Structure('point', fields=[
+    ...     Field('h', 'x'), Field('h', 'y', count=2, array=True)],
+    ...     byte_order='<')
+    >>> b = bytes(bytearray([1, 0, 2, 0, 3, 0]))
+    >>> data = LazyStructureData(point, b)
+    >>> sorted(data)
+    ['x', 'y']
+    >>> data.decoded()
+    []
+    >>> data['x']
+    1
+    >>> data.decoded()
+    ['x']
+    >>> data['y'].tolist()
+    [2, 3]
+    >>> data['x'] = 5
+    >>> dict(data)['x']
+    5
+    """
+    def __init__(self, structure, buffer, offset=0, context=None):
+        self._layout = structure._lazy_field_layout()
+        if self._layout is None:
+            raise ValueError(
+                'cannot lazily unpack {!r}'.format(structure))
+        self._structure = structure
+        self._buffer = buffer
+        self._offset = offset
+        self._context = context
+        self._names = [f.name for f in structure.fields]
+        self._cache = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        if key not in self._names:
+            raise KeyError(key)
+        self._cache[key] = self._decode(key)
+        return self._cache[key]
+
+    def _decode(self, key):
+        f,start,stop = self._layout[key]
+        if self._context is not None:
+            f = self._context.field(f, copy=isinstance(f, DynamicField))
+        raw = self._buffer[self._offset + start:self._offset + stop]
+        value = f.unpack_bytes(raw, self._structure.byte_order)
+        if hasattr(f, 'post_unpack'):
+            self._cache[key] = value
+            f.post_unpack(parents=[self._structure], data=self)
+            value = self._cache[key]
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self._names:
+            self._names.append(key)
+        self._cache[key] = value
+
+    def __delitem__(self, key):
+        if key not in self._names:
+            raise KeyError(key)
+        self._names.remove(key)
+        self._cache.pop(key, None)
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def decoded(self):
+        "Return the names of the fields that have already been decoded."
+        return [name for name in self._names if name in self._cache]
+
 
 class DebuggingStream (object):
     def __init__(self, stream):
@@ -609,6 +1668,83 @@ class DebuggingStream (object):
                 size, self.stream, len(data), data))
         return data
 
+    def tell(self):
+        return self.stream.tell()
+
+    def readinto(self, buffer):
+        size = self.stream.readinto(buffer)
+        _LOG.debug('read {} bytes into a buffer from {}'.format(
+                size, self.stream))
+        return size
+
+    def seek(self, offset, whence=0):
+        return self.stream.seek(offset, whence)
+
+
+class ParseTrace (object):
+    r"""Record where and how long ``DynamicStructure`` fields take to parse.
+
+    Pass a trace to ``ParseContext`` to record one row per unpacked
+    field: the field path, its offset and size in the stream, the time
+    spent decoding it, and the time spent in its ``pre_unpack`` and
+    ``post_unpack`` hooks.  Rows for fields of nested dynamic
+    structures are listed after their parent, and the parent's times
+    include them.
+
+    >>> vector = DynamicStructure('vector', fields=[
+    ...     Field('I', 'length'),
+    ...     Field('h', 'data', count=2, array=True)],
+    ...     byte_order='>')
+    >>> trace = ParseTrace()
+    >>> d,size = vector.unpack_from(
+    ...     bytes(bytearray(8)), context=ParseContext('>', trace=trace))
+    >>> [row[:3] for row in trace.rows]
+    [('vector.length', 0, 4), ('vector.data', 4, 4)]
+    >>> print(trace.format())  # doctest: +ELLIPSIS
+    offset size decode (ms) hook (ms) field
+         0    4 ...  vector.length
+         4    4 ...  vector.data
+    """
+    def __init__(self):
+        self.rows = []
+        self._stack = []
+
+    def start(self, structure, field, stream):
+        path = '{}.{}'.format(structure.name, field.name)
+        self.rows.append(None)  # filled in by .stop
+        self._stack.append(
+            [len(self.rows) - 1, path, self._tell(stream), _timer(), 0.0])
+
+    def add_hook_time(self, seconds):
+        if self._stack:
+            self._stack[-1][-1] += seconds
+
+    def stop(self, stream):
+        index,path,offset,start,hook_time = self._stack.pop()
+        elapsed = _timer() - start
+        end = self._tell(stream)
+        if offset is None or end is None:
+            size = None
+        else:
+            size = end - offset
+        self.rows[index] = (path, offset, size, elapsed - hook_time, hook_time)
+
+    def _tell(self, stream):
+        try:
+            return stream.tell()
+        except (AttributeError, IOError, OSError):
+            return None
+
+    def format(self):
+        "Return the trace as a text table."
+        lines = ['offset size decode (ms) hook (ms) field']
+        for path,offset,size,decode_time,hook_time in self.rows:
+            lines.append('{:>6} {:>4} {:>11.3f} {:>9.3f}  {}'.format(
+                    '-' if offset is None else offset,
+                    '-' if size is None else size,
+                    decode_time * 1e3, hook_time * 1e3, path))
+        return '\n'.join(lines)
+
 
 class DynamicStructure (Structure):
     r"""Represent a C structure field with a dynamic definition.
@@ -653,7 +1789,7 @@ class DynamicStructure (Structure):
     ...     vector_data = self._get_structure_data(
     ...         parents, data, vector_structure)
     ...     length = vector_data['length']
-    ...     data_field = vector_structure.get_field('data')
+    ...     data_field = self.context.field(vector_structure.get_field('data'))
     ...     data_field.count = length
     ...     data_field.setup()
 
@@ -694,6 +1830,14 @@ class DynamicStructure (Structure):
     >>> dynamic_data_vector.pack(d)
     b'\x00\x00\x00\x04\x00\x01\x00\x02\x00\x03\x00\x04'
 
+    ``.unpack_from`` parses a structure embedded in a larger buffer,
+    returning the unpacked data and the number of bytes consumed.
+
+    >>> d,size = dynamic_length_vector.unpack_from(
+    ...     b'\xff' + b + b'\xff\xff', offset=1)
+    >>> d['data'].tolist(), size
+    ([258, 772], 8)
+
     The implementation is a good deal more complicated than the one
     for ``Structure``, because we must make multiple calls to
     ``struct.Struct.unpack`` to unpack the data.
@@ -701,6 +1845,11 @@ class DynamicStructure (Structure):
     #def __init__(self, *args, **kwargs):
     #     pass #self.parent = ..
 
+    def get_format(self):
+        format = super(DynamicStructure, self).get_format()
+        self._field_runs = None  # compiled on first use
+        return format
+
     def _pre_pack(self, parents=None, data=None):
         if parents is None:
             parents = [self]
@@ -708,10 +1857,12 @@ class DynamicStructure (Structure):
             parents = parents + [self]
         for f in self.fields:
             if hasattr(f, 'pre_pack'):
-                _LOG.debug('pre-pack {}'.format(f))
+                if _LOG.isEnabledFor(_logging.DEBUG):
+                    _LOG.debug('pre-pack {}'.format(f))
                 f.pre_pack(parents=parents, data=data)
             if isinstance(f.format, DynamicStructure):
-                _LOG.debug('pre-pack {!r}'.format(f.format))
+                if _LOG.isEnabledFor(_logging.DEBUG):
+                    _LOG.debug('pre-pack {!r}'.format(f.format))
                 f._pre_pack(parents=parents, data=data)
 
     def pack(self, data):
@@ -725,112 +1876,225 @@ class DynamicStructure (Structure):
         return super(DynamicStructure, self).pack_into(
             buffer=buffer, offset=offset, data=data)
 
-    def unpack_stream(self, stream, parents=None, data=None, d=None):
+    def unpack_stream(self, stream, parents=None, data=None, d=None,
+                      context=None):
         # `d` is the working data directory
+        if context is None:
+            context = ParseContext(byte_order=self.byte_order)
+        debug = _LOG.isEnabledFor(_logging.DEBUG)
         if data is None:
             parents = [self]
             data = d = {}
-            if _LOG.level <= _logging.DEBUG:
+            if debug and context.trace is None:
                 stream = DebuggingStream(stream)
         else:
             parents = parents + [self]
 
+        trace = context.trace
+        if self._field_runs is None:
+            self._field_runs = self._compile_field_runs()
+        runs = trace is None and not debug and context.byte_order != '@'
+        for fields,run in self._field_runs:
+            if run is not None and runs and not any(
+                    f in context._fields for f in fields):
+                self._unpack_run(stream, fields, run, d, context)
+                continue
+            for f in fields:
+                f = context.field(f, copy=isinstance(f, DynamicField))
+                if trace is None:
+                    self._unpack_field(
+                        stream, f, parents, data, d, context, debug)
+                    continue
+                trace.start(self, f, stream)
+                try:
+                    self._unpack_field(
+                        stream, f, parents, data, d, context, debug)
+                finally:
+                    trace.stop(stream)
+        return data
+
+    def _compile_field_runs(self):
+        """Group our fields for ``.unpack_stream``.
+
+        Returns a list of ``(fields, run)`` pairs.  Consecutive plain
+        fields with a primitive format have a fixed layout unless a
+        hook changes their per-call copies, so runs of two or more are
+        unpacked together by a static ``Structure`` (and its generated
+        unpacker).  ``run`` is ``None`` for fields that are unpacked
+        one at a time.
+        """
+        runs = []
+        static = []
+        def flush():
+            if len(static) > 1:
+                name = '{}.{}-{}'.format(
+                    self.name, static[0].name, static[-1].name)
+                runs.append((tuple(static), Structure(
+                            name, fields=list(static), byte_order='=')))
+            else:
+                runs.extend(((f,), None) for f in static)
+            del static[:]
         for f in self.fields:
+            if (isinstance(f.format, Structure) or
+                    isinstance(f, DynamicField) or
+                    hasattr(f, 'unpack') or
+                    type(f).unpack_bytes is not Field.unpack_bytes or
+                    (f.format == 'x' and not f.array)):
+                flush()
+                runs.append(((f,), None))
+            else:
+                static.append(f)
+        flush()
+        return runs
+
+    def _unpack_run(self, stream, fields, run, d, context):
+        """Unpack a run of static fields (see ``._compile_field_runs``)."""
+        structure = run.for_order(context.byte_order)
+        raw = stream.read(structure.size)
+        if len(raw) < structure.size:
+            available = len(raw)
+            for f in fields:
+                size = structure._field_size(f)
+                if available < size:
+                    raise ValueError(
+                        'not enough data to unpack {}.{} ({} < {})'.format(
+                            self, f, available, size))
+                available -= size
+        d.update(structure.unpack_from(raw))
+
+    def _run_hook(self, hook, parents, data, trace):
+        if trace is None:
+            return hook(parents=parents, data=data)
+        start = _timer()
+        try:
+            return hook(parents=parents, data=data)
+        finally:
+            trace.add_hook_time(_timer() - start)
+
+    def _unpack_field(self, stream, f, parents, data, d, context, debug):
+        """Unpack a single field for ``.unpack_stream``."""
+        trace = context.trace
+        if debug:
             _LOG.debug('parsing {!r}.{} (count={}, item_count={})'.format(
                     self, f, f.count, f.item_count))
-            if _LOG.level <= _logging.DEBUG:
-                _LOG.debug('data:\n{}'.format(_pprint.pformat(data)))
-            if hasattr(f, 'pre_unpack'):
+            _LOG.debug('data:\n{}'.format(_pprint.pformat(data)))
+        if hasattr(f, 'pre_unpack'):
+            if debug:
                 _LOG.debug('pre-unpack {}'.format(f))
-                f.pre_unpack(parents=parents, data=data)
+            self._run_hook(f.pre_unpack, parents, data, trace)
 
-            if hasattr(f, 'unpack'):  # override default unpacking
+        if hasattr(f, 'unpack'):  # override default unpacking
+            if debug:
                 _LOG.debug('override unpack for {}'.format(f))
-                d[f.name] = f.unpack(stream)
-                continue
-
-            # setup for unpacking loop
-            if isinstance(f.format, Structure):
-                f.format.set_byte_order(self.byte_order)
-                f.setup()
-                f.format.setup()
-                if isinstance(f.format, DynamicStructure):
-                    if f.array:
-                        d[f.name] = []
-                        for i in range(f.item_count):
-                            x = {}
-                            d[f.name].append(x)
-                            f.format.unpack_stream(
-                                stream, parents=parents, data=data, d=x)
-                    else:
-                        assert f.item_count == 1, (f, f.count)
-                        d[f.name] = {}
-                        f.format.unpack_stream(
-                            stream, parents=parents, data=data, d=d[f.name])
-                    if hasattr(f, 'post_unpack'):
+            d[f.name] = f.unpack(stream)
+            return
+
+        # setup for unpacking loop
+        if isinstance(f.format, Structure):
+            structure = f.format
+            lazy = (context.lazy and not f.array and
+                    structure.for_order(context.byte_order
+                                        )._lazy_field_layout() is not None)
+            if isinstance(structure, DynamicStructure) and not lazy:
+                if f.array:
+                    d[f.name] = []
+                    for i in range(f.item_count):
+                        x = {}
+                        d[f.name].append(x)
+                        structure.unpack_stream(
+                            stream, parents=parents, data=data, d=x,
+                            context=context)
+                else:
+                    assert f.item_count == 1, (f, f.count)
+                    d[f.name] = {}
+                    structure.unpack_stream(
+                        stream, parents=parents, data=data, d=d[f.name],
+                        context=context)
+                if hasattr(f, 'post_unpack'):
+                    if debug:
                         _LOG.debug('post-unpack {}'.format(f))
-                        repeat = f.post_unpack(parents=parents, data=data)
-                        if repeat:
-                            raise NotImplementedError(
-                                'cannot repeat unpack for dynamic structures')
-                    continue
-            if isinstance(f.format, Structure):
+                    repeat = self._run_hook(
+                        f.post_unpack, parents, data, trace)
+                    if repeat:
+                        raise NotImplementedError(
+                            'cannot repeat unpack for dynamic structures')
+                return
+        if isinstance(f.format, Structure):
+            structure = structure.for_order(context.byte_order)
+            if debug:
                 _LOG.debug('parsing {} bytes for {}'.format(
-                        f.format.size, f.format.format))
-                bs = [stream.read(f.format.size) for i in range(f.item_count)]
-                def unpack():
-                    f.format.set_byte_order(self.byte_order)
-                    f.setup()
-                    f.format.setup()
-                    x = [f.format.unpack_from(b) for b in bs]
-                    if not f.array:
-                        assert len(x) == 1, (f, f.count, x)
-                        x = x[0]
-                    return x
+                        structure.size, structure.format))
+            if f.array:
+                raw = stream.read(structure.size * f.item_count)
+                if len(raw) < structure.size * f.item_count:
+                    raise ValueError(
+                        'not enough data to unpack {}.{}'.format(self, f))
             else:
-                field_format = self.byte_order + f.format*f.item_count
-                field_format = field_format.replace('P', 'I')
-                try:
-                    size = _struct.calcsize(field_format)
-                except _struct.error as e:
-                    _LOG.error(e)
-                    _LOG.error('{}.{}: {}'.format(self, f, field_format))
-                    raise
+                bs = [stream.read(structure.size)
+                      for i in range(f.item_count)]
+                if lazy and len(bs[0]) < structure.size:
+                    raise ValueError(
+                        'not enough data to unpack {}.{}'.format(self, f))
+            def unpack():
+                structure = f.format.for_order(context.byte_order)
+                if lazy:
+                    return LazyStructureData(
+                        structure, bs[0], context=context)
+                if f.array:
+                    try:
+                        records = structure.unpack_array(
+                            raw, count=f.item_count)
+                    except ValueError:  # no numpy equivalent
+                        size = structure.size
+                        return [structure.unpack_from(raw, i*size)
+                                for i in range(f.item_count)]
+                    return structure._unpack_records(records)
+                x = [structure.unpack_from(b) for b in bs]
+                assert len(x) == 1, (f, f.count, x)
+                return x[0]
+        else:
+            field_format = context.byte_order + f.format*f.item_count
+            field_format = field_format.replace('P', 'I')
+            try:
+                size = _struct.calcsize(field_format)
+            except _struct.error as e:
+                _LOG.error(e)
+                _LOG.error('{}.{}: {}'.format(self, f, field_format))
+                raise
+            if debug:
                 _LOG.debug('parsing {} bytes for preliminary {}'.format(
                         size, field_format))
-                raw = stream.read(size)
-                if len(raw) < size:
-                    raise ValueError(
-                        'not enough data to unpack {}.{} ({} < {})'.format(
-                            self, f, len(raw), size))
-                def unpack():
-                    field_format = self.byte_order + f.format*f.item_count
-                    field_format = field_format.replace('P', 'I')
-                    _LOG.debug('parse previous bytes using {}'.format(
-                            field_format))
-                    struct = _struct.Struct(field_format)
-                    items = struct.unpack(raw)
-                    return f.unpack_data(items)
-
-            # unpacking loop
-            repeat = True
-            while repeat:
-                d[f.name] = unpack()
-                if hasattr(f, 'post_unpack'):
+            raw = stream.read(size)
+            if len(raw) < size:
+                raise ValueError(
+                    'not enough data to unpack {}.{} ({} < {})'.format(
+                        self, f, len(raw), size))
+            def unpack():
+                return f.unpack_bytes(raw, context.byte_order)
+
+        # unpacking loop
+        repeat = True
+        while repeat:
+            d[f.name] = unpack()
+            if hasattr(f, 'post_unpack'):
+                if debug:
                     _LOG.debug('post-unpack {}'.format(f))
-                    repeat = f.post_unpack(parents=parents, data=data)
-                else:
-                    repeat = False
-                if repeat:
-                    _LOG.debug('repeat unpack for {}'.format(f))
-
-        return data
+                repeat = self._run_hook(f.post_unpack, parents, data, trace)
+            else:
+                repeat = False
+            if repeat and debug:
+                _LOG.debug('repeat unpack for {}'.format(f))
 
     def unpack(self, string):
-        stream = _io.BytesIO(string)
+        stream = _BufferCursor(string)
         return self.unpack_stream(stream)
 
-    def unpack_from(self, buffer, offset=0, *args, **kwargs):
-        args = super(Structure, self).unpack_from(
-            buffer, offset, *args, **kwargs)
-        return self._unpack_item(args)
+    def unpack_from(self, buffer, offset=0, context=None):
+        """Unpack a structure starting at ``offset`` in ``buffer``.
+
+        Unlike ``Structure.unpack_from``, this returns a ``(data,
+        size)`` tuple, where ``size`` is the number of bytes consumed.
+        """
+        stream = _BufferCursor(buffer, offset=offset)
+        data = self.unpack_stream(stream, context=context)
+        return (data, stream.tell() - offset)
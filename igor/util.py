@@ -17,7 +17,9 @@
 
 "Utility functions for handling buffers"
 
+import os as _os
 import sys as _sys
+import threading as _threading
 
 import numpy as _numpy
 
@@ -100,16 +102,160 @@ def need_to_reorder_bytes(version):
 
 # From ReadWave.c
 def checksum(buffer, byte_order, oldcksum, numbytes):
-    x = _numpy.ndarray(
-        (numbytes/2,), # 2 bytes to a short -- ignore trailing odd byte
-        dtype=_numpy.dtype(byte_order+'h'),
-        buffer=buffer)
-    oldcksum += x.sum()
-    if oldcksum > 2**31:  # fake the C implementation's int rollover
-        oldcksum %= 2**32
-        if oldcksum > 2**31:
-            oldcksum -= 2**31
-    return oldcksum & 0xffff
+    r"""Add the first ``numbytes`` of ``buffer`` as shorts to ``oldcksum``.
+
+    Like the C implementation, the sum is kept in 16 bits and a
+    trailing odd byte is ignored.  The result is in ``range(2**16)``,
+    and Igor headers with a valid checksum sum to zero.
+
+    >>> checksum(b'\x00\x01\xff\xff\x00', '>', 0, 5)
+    0
+    >>> checksum(b'\x7f\xff\x00\x02', '>', 3, 4)
+    32772
+    >>> checksum(b'\x00\x80\x00\x80', '<', 0, 4)
+    0
+    """
+    x = _numpy.frombuffer(
+        buffer, dtype=_numpy.dtype(byte_order+'h'), count=numbytes//2)
+    return (oldcksum + int(x.sum(dtype=_numpy.int64))) & 0xffff
+
+class BufferCursor (object):
+    r"""Read from an in-memory buffer by advancing an offset.
+
+    Supports the ``read`` interface used by
+    ``igor.struct.DynamicStructure.unpack_stream``, but instead of
+    copying data out of a file for every read, it returns
+    ``memoryview`` slices of a single buffer (``bytes``,
+    ``bytearray``, ``mmap.mmap``, ...).
+
+    >>> cursor = BufferCursor(b'abcdef', offset=1)
+    >>> cursor.read(2).tobytes()
+    b'bc'
+    >>> cursor.tell()
+    3
+    >>> cursor.read().tobytes()
+    b'def'
+    >>> cursor.read(1).tobytes()
+    b''
+    >>> cursor.seek(0)
+    0
+    >>> target = bytearray(4)
+    >>> cursor.readinto(target)
+    4
+    >>> bytes(target)
+    b'abcd'
+    """
+    def __init__(self, buffer, offset=0):
+        view = memoryview(buffer)
+        if view.ndim != 1 or view.itemsize != 1:
+            view = view.cast('B')
+        self.buffer = view
+        self.offset = offset
+
+    def read(self, size=-1):
+        start = self.offset
+        if size is None or size < 0:
+            end = len(self.buffer)
+        else:
+            end = min(start + size, len(self.buffer))
+        self.offset = max(start, end)
+        return self.buffer[start:end]
+
+    def readinto(self, buffer):
+        target = memoryview(buffer)
+        if target.ndim != 1 or target.itemsize != 1:
+            target = target.cast('B')
+        data = self.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.offset
+        elif whence == 2:
+            offset += len(self.buffer)
+        self.offset = offset
+        return self.offset
+
+
+def read_buffer(stream, writable=False):
+    """Read the rest of ``stream``.
+
+    With ``writable=True``, read into a ``bytearray`` (directly, if
+    the size of a file stream is known) instead of ``bytes``.
+    """
+    if not writable:
+        return stream.read()
+    try:
+        size = _os.fstat(stream.fileno()).st_size - stream.tell()
+    except Exception:  # not a real file
+        return bytearray(stream.read())
+    buffer = bytearray(max(size, 0))
+    size = stream.readinto(buffer)
+    del buffer[size:]
+    return buffer
+
+
+class BufferPool (object):
+    """Recycle arrays of a given dtype and shape.
+
+    ``get`` returns a released array with the requested dtype and
+    (Fortran-order) shape if there is one, or allocates a new one.
+    Pass arrays you no longer need to ``release`` so later ``get``
+    calls can reuse them.  At most ``max_per_key`` released arrays are
+    kept for each (dtype, shape).  Only writeable, Fortran-contiguous
+    arrays that own their memory are kept, so views (such as the
+    read-only ``wData`` returned by ``binarywave.loads``) and memory
+    maps are ignored.  Pools may be shared between threads.
+
+    >>> pool = BufferPool()
+    >>> a = pool.get('>f4', (3, 2))
+    >>> a.shape, a.dtype.str, a.flags.f_contiguous
+    ((3, 2), '>f4', True)
+    >>> pool.release(a)
+    >>> pool.get('>f4', (3, 2)) is a
+    True
+    >>> pool.get('>f4', (3, 2)) is a
+    False
+    >>> b = pool.get('>f4', (3, 2))
+    >>> b.flags.writeable = False
+    >>> pool.release(b)
+    >>> pool.release(a[:2])
+    >>> pool.get('>f4', (3, 2)) is b
+    False
+    """
+    def __init__(self, max_per_key=4):
+        self.max_per_key = max_per_key
+        self._free = {}
+        self._lock = _threading.Lock()
+
+    def _key(self, dtype, shape):
+        return (_numpy.dtype(dtype).str, tuple(int(n) for n in shape))
+
+    def get(self, dtype, shape):
+        key = self._key(dtype, shape)
+        with self._lock:
+            free = self._free.get(key, None)
+            if free:
+                return free.pop()
+        return _numpy.empty(shape, dtype=dtype, order='F')
+
+    def release(self, array):
+        if not isinstance(array, _numpy.ndarray):
+            return  # e.g. decoded text waves
+        flags = array.flags
+        if not (flags.writeable and flags.f_contiguous and flags.owndata):
+            return  # views and memory maps cannot be loaded into
+        key = self._key(array.dtype, array.shape)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_per_key and not any(
+                    a is array for a in free):
+                free.append(array)
+
 
 def _bytes(obj, encoding='utf-8'):
     """Convert bytes or strings into bytes
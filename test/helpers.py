@@ -0,0 +1,94 @@
+# Copyright
+
+"""Sample files and helpers shared by the tests."""
+
+import io
+import os
+import os.path
+
+import numpy
+
+from igor.binarywave import load, save
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+SAMPLE_FILES = sorted(
+    filename for filename in os.listdir(DATA_DIR)
+    if filename.endswith('.ibw'))
+
+SAMPLE_PATHS = [os.path.join(DATA_DIR, filename) for filename in SAMPLE_FILES]
+
+
+def same(a, b):
+    "Compare nested dicts and lists that may hold numpy arrays"
+    if isinstance(a, dict):
+        return (isinstance(b, dict) and sorted(a) == sorted(b) and
+                all(same(a[key], b[key]) for key in a))
+    if isinstance(a, (list, tuple)):
+        return (len(a) == len(b) and
+                all(same(x, y) for x,y in zip(a, b)))
+    return bool(numpy.array_equal(a, b))
+
+
+def wave_bytes(shape, byte_order, start=0, name=b'wave0'):
+    "Return the bytes of a version 5 wave with distinct values"
+    wData = numpy.arange(
+        start, start + numpy.prod(shape), dtype=numpy.float64).reshape(
+        shape, order='F')
+    stream = io.BytesIO()
+    save(stream, {'version': 5, 'wave': {
+                'wave_header': {'bname': name}, 'wData': wData,
+                'note': b'a note'}},
+         byte_order=byte_order)
+    return stream.getvalue()
+
+
+def write_wave(path, shape, byte_order, start=0, name=b'wave0'):
+    "Save a version 5 wave with distinct values to ``path``"
+    with open(path, 'wb') as f:
+        f.write(wave_bytes(shape, byte_order, start=start, name=name))
+
+
+def big_wave(directory):
+    """Save the big test wave in ``directory`` and return its path.
+
+    The big wave is a multi-dimensional, big-endian version 5 wave,
+    so loaders are also checked on data that is neither 1D nor in the
+    byte order of the machine running the tests.
+    """
+    path = os.path.join(directory, 'big.ibw')
+    write_wave(path, shape=(50, 6, 4), byte_order='>')
+    return path
+
+
+def sample_and_big_waves(directory, numeric=False):
+    """Yield ``(path, expected)`` for the sample files and the big wave.
+
+    ``expected`` is the plain ``load`` of ``path``, for comparison
+    with loads using other options.  The big wave is saved in
+    ``directory`` (see ``big_wave``).  With ``numeric=True``, text
+    waves are skipped.
+    """
+    for path in SAMPLE_PATHS + [big_wave(directory)]:
+        expected = load(path)
+        if numeric and expected['wave']['wData'].dtype.kind in 'SO':
+            continue
+        yield (path, expected)
+
+
+def check_wave(loaded, expected, label, native=False):
+    """Check that ``loaded`` matches the plain ``expected`` load.
+
+    With ``native=True``, numeric ``wData`` must be in native byte
+    order instead of the file's byte order.
+    """
+    assert same(loaded, expected), label
+    a = loaded['wave']['wData']
+    b = expected['wave']['wData']
+    if native and b.dtype.kind not in 'SO':
+        assert a.dtype.isnative, (label, a.dtype)
+        assert a.dtype == b.dtype.newbyteorder('='), (label, a.dtype, b.dtype)
+    else:
+        assert a.dtype == b.dtype, (label, a.dtype, b.dtype)
+    assert a.shape == b.shape, (label, a.shape, b.shape)
@@ -0,0 +1,93 @@
+# Copyright
+
+r"""Test the code generated for structure packing and unpacking.
+
+Runs of static fields in dynamic structures are unpacked by generated
+code.  While tracing, fields are unpacked one at a time instead, and
+both give the same results for every sample file:
+
+>>> for path in SAMPLE_PATHS:
+...     with open(path, 'rb') as f:
+...         buffer = f.read()
+...     expected = loads(buffer, trace=ParseTrace())
+...     assert same(loads(buffer), expected), path
+
+With ``CODE_CACHE`` set, the first process compiles the generated
+code and stores it in the cache:
+
+>>> cache = tempfile.mkdtemp()
+>>> print(run(cache))
+loaded
+>>> files = sorted(os.listdir(cache))
+>>> sorted(set(filename.split('-')[0] for filename in files))
+['pack', 'unpack']
+
+Later processes load the cached code instead of compiling it
+(``compile`` raises an exception in the second run):
+
+>>> print(run(cache, compile=False))
+loaded
+>>> sorted(os.listdir(cache)) == files
+True
+>>> shutil.rmtree(cache)
+"""
+
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import igor
+from igor.binarywave import loads
+from igor.struct import ParseTrace
+
+from helpers import DATA_DIR, SAMPLE_PATHS, same
+
+
+SCRIPT = r"""
+import io
+import os.path
+import sys
+
+import igor.struct
+
+igor.struct.CODE_CACHE = sys.argv[1]
+if sys.argv[2] == 'cached':
+    def compile(source, filename, mode):
+        raise AssertionError('compiled {}'.format(filename))
+    igor.struct.compile = compile
+
+from igor.binarywave import load, save
+from igor.packed import load as loadpxp
+
+data_dir = sys.argv[3]
+for filename in sorted(os.listdir(data_dir)):
+    path = os.path.join(data_dir, filename)
+    if filename.endswith('.ibw'):
+        wave = load(path)
+        if wave['version'] in [2, 5]:
+            save(io.BytesIO(), wave)
+    elif filename.endswith('.pxp'):
+        loadpxp(path)
+print('loaded')
+"""
+
+
+def run(cache, compile=True):
+    "Load and save the sample files in a new process using ``cache``"
+    env = dict(os.environ)
+    package_dir = os.path.dirname(os.path.dirname(
+            os.path.abspath(igor.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [package_dir] + [p for p in [env.get('PYTHONPATH')] if p])
+    process = subprocess.Popen(
+        [sys.executable, '-c', SCRIPT, cache,
+         'compile' if compile else 'cached', DATA_DIR],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    output,error = process.communicate()
+    if process.returncode:
+        # ignore warnings on stderr unless the process failed
+        output += error
+    return output.decode('utf-8').strip()
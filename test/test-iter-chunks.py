@@ -0,0 +1,66 @@
+# Copyright
+
+r"""Test streaming binary wave data in chunks.
+
+``iter_chunks`` streams the data in file order, from paths and
+streams:
+
+>>> tmp = tempfile.TemporaryDirectory()
+>>> for path,expected in sample_and_big_waves(tmp.name, numeric=True):
+...     wData = expected['wave']['wData']
+...     flat = wData.ravel(order='F')
+...     for points in [1, 7, 300, 10000]:
+...         with open(path, 'rb') as f:
+...             for chunks in [list(iter_chunks(path, points)),
+...                            list(iter_chunks(f, points))]:
+...                 assert all(len(c) == points for c in chunks[:-1]), path
+...                 assert all(c.dtype == wData.dtype for c in chunks), path
+...                 assert numpy.array_equal(
+...                     numpy.concatenate([flat[:0]] + chunks), flat), path
+>>> big = big_wave(tmp.name)
+>>> [len(chunk) for chunk in iter_chunks(big, 500)]
+[500, 500, 200]
+>>> list(iter_chunks(os.path.join(DATA_DIR, 'mac-zeroPointWave.ibw'), 5))
+[]
+>>> iter_chunks(os.path.join(DATA_DIR, 'win-textWave.ibw'), 5)
+Traceback (most recent call last):
+  ...
+ValueError: chunked reads are not supported for text waves
+
+Invalid arguments and files are reported when ``iter_chunks`` is
+called, before any chunk is read:
+
+>>> iter_chunks(big, 0)
+Traceback (most recent call last):
+  ...
+ValueError: points_per_chunk must be positive, not 0
+>>> iter_chunks(os.path.join(tmp.name, 'missing.ibw'), 5)
+... # doctest: +ELLIPSIS
+Traceback (most recent call last):
+  ...
+FileNotFoundError: [Errno 2] No such file or directory: '...missing.ibw'
+>>> iter_chunks(io.BytesIO(b'\x05\x00'), 5)
+Traceback (most recent call last):
+  ...
+ValueError: unexpected end of binary wave file (0 of 62 bytes)
+
+Truncated data is only found while reading it:
+
+>>> with open(big, 'rb') as f:
+...     truncated = io.BytesIO(f.read()[:-100])
+>>> [len(chunk) for chunk in iter_chunks(truncated, 1100)]
+Traceback (most recent call last):
+  ...
+ValueError: unexpected end of binary wave file (706 of 800 bytes)
+>>> tmp.cleanup()
+"""
+
+import io
+import os.path
+import tempfile
+
+import numpy
+
+from igor.binarywave import iter_chunks
+
+from helpers import DATA_DIR, big_wave, sample_and_big_waves
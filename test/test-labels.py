@@ -0,0 +1,44 @@
+# Copyright
+
+r"""Test loading dimension labels.
+
+Labels are stored in 32 byte chunks, and a label that does not fit in
+one chunk continues in the next.  With ``labels='array'``, each
+dimension's labels are a fixed-width bytes array, wide enough for the
+longest label, and dimensions without labels give empty arrays.  The
+arrays hold the same labels as the default lists:
+
+>>> long_label = b'a label that is longer than 32 bytes'
+>>> labels = [[b'rows', b'r0', long_label, b''], [], [b'', b'l0', b'l1']]
+>>> for byte_order in '<>':
+...     buffer = labeled_wave(labels, byte_order)
+...     arrays = loads(buffer, labels='array')['wave']['labels']
+...     lists = loads(buffer)['wave']['labels']
+...     assert [a.tolist() for a in arrays] == lists, (byte_order, arrays)
+...     assert lists == labels + [[]], (byte_order, lists)
+>>> for a in arrays:
+...     print(a.dtype, a.shape)
+|S36 (4,)
+|S32 (0,)
+|S32 (3,)
+|S32 (0,)
+>>> arrays[0].tolist()[2] == long_label
+True
+"""
+
+import io
+
+import numpy
+
+from igor.binarywave import loads, save
+
+
+def labeled_wave(labels, byte_order):
+    "Return the bytes of a version 5 wave with dimension ``labels``"
+    stream = io.BytesIO()
+    save(stream, {'version': 5, 'wave': {
+                'wave_header': {'bname': b'labeled'},
+                'wData': numpy.zeros((3, 2, 2)),
+                'labels': labels}},
+         byte_order=byte_order)
+    return stream.getvalue()
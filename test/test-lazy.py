@@ -0,0 +1,56 @@
+# Copyright
+
+r"""Test lazy header decoding against plain loads.
+
+With ``lazy=True``, the binary and wave headers are
+``LazyStructureData`` mappings.  Loading only decodes the wave header
+fields needed to read the data:
+
+>>> decoded = set()
+>>> for path in SAMPLE_PATHS:
+...     with open(path, 'rb') as f:
+...         buffer = f.read()
+...     expected = load(path)
+...     for loaded in [load(path, lazy=True), loads(buffer, lazy=True)]:
+...         wave_header = loaded['wave']['wave_header']
+...         assert isinstance(wave_header, LazyStructureData), path
+...         decoded.update(wave_header.decoded())
+...         check_lazy_wave(loaded, expected, path)
+>>> sorted(decoded)
+['nDim', 'npnts', 'type']
+
+but the decoded headers match those of a plain load.  The same holds
+for the waves in packed experiments, where the wave name is decoded
+as well to build the filesystem:
+
+>>> path = os.path.join(DATA_DIR, 'polar-graphs-demo.pxp')
+>>> records,filesystem = packed.load(path, lazy=True)
+>>> expected_records,expected_filesystem = packed.load(path)
+>>> decoded = set()
+>>> for record,expected in zip(records, expected_records):
+...     if isinstance(record, WaveRecord):
+...         decoded.update(record.wave['wave']['wave_header'].decoded())
+...         check_lazy_wave(record.wave, expected.wave, record)
+>>> sorted(decoded)
+['bname', 'nDim', 'npnts', 'type']
+>>> list(filesystem['root']) == list(expected_filesystem['root'])
+True
+"""
+
+import os.path
+
+from igor import packed
+from igor.binarywave import load, loads
+from igor.record.wave import WaveRecord
+from igor.struct import LazyStructureData
+
+from helpers import DATA_DIR, SAMPLE_PATHS, same
+
+
+def check_lazy_wave(loaded, expected, label):
+    "Check that a lazily loaded wave matches the plain ``expected`` load"
+    wave = dict(loaded['wave'])
+    for key in ['bin_header', 'wave_header']:
+        assert isinstance(wave[key], LazyStructureData), (label, key)
+        wave[key] = dict(wave[key])
+    assert same(dict(loaded, wave=wave), expected), label
@@ -0,0 +1,123 @@
+# Copyright
+
+r"""Test partial wave data reads.
+
+``load_data`` gives the same data as indexing a fully loaded wave:
+
+>>> tmp = tempfile.TemporaryDirectory()
+>>> for path,expected in sample_and_big_waves(tmp.name, numeric=True):
+...     wData = expected['wave']['wData']
+...     for index in [Ellipsis, slice(None, None, 2), slice(None, None, -1),
+...                   slice(1, -1, 3), -1]:
+...         if wData.size or index is Ellipsis:
+...             check(load_data(path, index), wData[index], (path, index))
+
+including multi-dimensional indexes into the big wave:
+
+>>> with open(big_wave(tmp.name), 'rb') as f:
+...     buffer = f.read()
+>>> tmp.cleanup()
+>>> wData = load(io.BytesIO(buffer))['wave']['wData']
+>>> for index in INDEXES:
+...     check(load_data(io.BytesIO(buffer), index), wData[index], index)
+
+Contiguous rows are read together, once per selected combination of
+the outer dimensions:
+
+>>> data_reads(buffer, (slice(10, 20), slice(1, 3), 2))
+[80, 80]
+
+When whole rows are selected, consecutive combinations of the outer
+dimensions are contiguous, and are read together too:
+
+>>> data_reads(buffer, Ellipsis)
+[9600]
+>>> data_reads(buffer, (slice(None), slice(1, 3), 2))
+[800]
+>>> data_reads(buffer, (Ellipsis, slice(None, None, 2)))
+[2400, 2400]
+
+Rows a few points apart are read through, dropping the points between
+them:
+
+>>> data_reads(buffer, (slice(1, 10, 3), 0, 0))
+[56]
+>>> data_reads(buffer, (slice(None, None, 20), 5, 3))
+[328]
+>>> data_reads(buffer, (slice(None, None, -20), 1, Ellipsis))
+[328, 328, 328, 328]
+
+Rows further apart than ``LOAD_DATA_GAP`` bytes are read one point
+at a time instead of reading the whole span:
+
+>>> long_buffer = wave_bytes(shape=(2000, 2), byte_order='<')
+>>> data_reads(long_buffer, (slice(None, None, 600), 1))
+[8, 8, 8, 8]
+>>> long_wData = load(io.BytesIO(long_buffer))['wave']['wData']
+>>> for index in [(slice(None, None, 600), 1), (slice(1, None, -700),)]:
+...     check(load_data(io.BytesIO(long_buffer), index), long_wData[index],
+...           index)
+
+and no read is larger than ``LOAD_DATA_READ_SIZE``:
+
+>>> read_size = binarywave.LOAD_DATA_READ_SIZE
+>>> binarywave.LOAD_DATA_READ_SIZE = 128
+>>> try:
+...     print(data_reads(buffer, (Ellipsis, 0, 0)))
+...     print(data_reads(buffer, (slice(None, None, 2), 0, 0)))
+...     for index in INDEXES:
+...         check(load_data(io.BytesIO(buffer), index), wData[index], index)
+... finally:
+...     binarywave.LOAD_DATA_READ_SIZE = read_size
+[128, 128, 128, 16]
+[120, 120, 120, 8]
+"""
+
+import io
+import tempfile
+
+import numpy
+
+from igor import binarywave
+from igor.binarywave import load, load_data, load_header
+
+from helpers import big_wave, sample_and_big_waves, wave_bytes
+
+INDEXES = [
+    Ellipsis,
+    (slice(None, None, 3), 2),
+    (slice(None, None, 20), slice(None), 1),
+    (slice(None, None, -7), slice(1, 5, 2), 3),
+    (5, Ellipsis, 1),
+    (slice(40, 2, -2), -1),
+    (Ellipsis, slice(3, 0, -1)),
+    (slice(None), slice(2, 5), slice(1, 4, 2)),
+    (slice(None), 3, slice(None, None, -1)),
+    ]
+
+
+class CountingStream (io.BytesIO):
+    "Record the position and size of every read"
+    def __init__(self, *args, **kwargs):
+        super(CountingStream, self).__init__(*args, **kwargs)
+        self.reads = []
+
+    def read(self, *args):
+        position = self.tell()
+        data = super(CountingStream, self).read(*args)
+        self.reads.append((position, len(data)))
+        return data
+
+
+def data_reads(buffer, index):
+    "Return the sizes of the reads ``load_data`` makes past the headers"
+    data_offset = load_header(io.BytesIO(buffer))['data_offset']
+    stream = CountingStream(buffer)
+    load_data(stream, index)
+    return [size for position,size in stream.reads if position >= data_offset]
+
+
+def check(data, expected, label):
+    assert data.shape == expected.shape, (label, data.shape, expected.shape)
+    assert data.dtype == expected.dtype, (label, data.dtype, expected.dtype)
+    assert numpy.array_equal(data, expected), (label, data, expected)
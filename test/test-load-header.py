@@ -0,0 +1,68 @@
+# Copyright
+
+r"""Test reading binary wave headers without their data.
+
+>>> header = load_header(os.path.join(DATA_DIR, 'win-version5.ibw'))
+>>> (header['version'], header['byte_order'], header['data_offset'],
+...  header['data_size'], header['shape'])
+(5, '<', 384, 20, (5,))
+>>> header['wave_header']['bname']
+b'version5'
+
+The headers match those of a full ``load`` for every sample file, and
+``data_offset``, ``data_size``, ``dtype`` and ``shape`` locate and
+describe the numeric data:
+
+>>> for path in SAMPLE_PATHS:
+...     with open(path, 'rb') as f:
+...         raw = f.read()
+...     check_header(load_header(path, verify=True), load(path), path, raw)
+
+Streams are read from their current position, and left at the start of
+the data:
+
+>>> with open(os.path.join(DATA_DIR, 'mac-version5.ibw'), 'rb') as f:
+...     stream = io.BytesIO(b'padding' + f.read())
+>>> _ = stream.seek(len(b'padding'))
+>>> header = load_header(stream)
+>>> header['byte_order'], stream.tell() - len(b'padding') == header['data_offset']
+('>', True)
+
+Multi-dimensional big-endian waves have a Fortran-order shape:
+
+>>> wData = numpy.arange(24, dtype='>i2').reshape((2, 3, 4), order='F')
+>>> stream = io.BytesIO()
+>>> save(stream, {'version': 5, 'wave': {
+...     'wave_header': {'bname': b'wave0'}, 'wData': wData}}, byte_order='>')
+>>> _ = stream.seek(0)
+>>> header = load_header(stream)
+>>> header['shape'], header['dtype'] == numpy.dtype('>i2'), header['data_size']
+((2, 3, 4), True, 48)
+>>> _ = stream.seek(0)
+>>> check_header(header, load(stream), 'multi-dimensional', stream.getvalue())
+"""
+
+import io
+import os.path
+
+import numpy
+
+from igor.binarywave import TYPE_TABLE, load, load_header, save
+
+from helpers import DATA_DIR, SAMPLE_PATHS, same
+
+
+def check_header(header, data, label, raw):
+    for key in ['version', 'bin_header', 'wave_header']:
+        assert same(header[key], data[key] if key == 'version'
+                    else data['wave'][key]), (label, key)
+    wData = data['wave']['wData']
+    if TYPE_TABLE[header['wave_header']['type']] is None:  # text wave
+        assert header['dtype'] == numpy.dtype('S1'), (label, header['dtype'])
+        return
+    assert header['dtype'] == wData.dtype, (label, header['dtype'])
+    assert header['shape'] == wData.shape, (label, header['shape'])
+    assert header['data_size'] == wData.nbytes, (label, header['data_size'])
+    start = header['data_offset']
+    assert raw[start:start + header['data_size']] == wData.tobytes(
+        order='F'), (label, start)
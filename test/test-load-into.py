@@ -0,0 +1,84 @@
+# Copyright
+
+r"""Test loading wave data into caller-supplied and pooled arrays.
+
+Numeric data is read into ``out`` arrays, which may have either byte
+order, from paths, streams and buffers:
+
+>>> tmp = tempfile.TemporaryDirectory()
+>>> for path,expected in sample_and_big_waves(tmp.name, numeric=True):
+...     wData = expected['wave']['wData']
+...     with open(path, 'rb') as f:
+...         buffer = f.read()
+...     for dtype in [wData.dtype, wData.dtype.newbyteorder('S')]:
+...         for loader in [lambda out: load(path, out=out),
+...                        lambda out: load(io.BytesIO(buffer), out=out),
+...                        lambda out: loads(buffer, out=out)]:
+...             out = numpy.empty(wData.shape, dtype=dtype, order='F')
+...             loaded = loader(out)
+...             assert loaded['wave']['wData'] is out, path
+...             assert out.dtype == dtype, (path, out.dtype)
+...             assert same(loaded, expected), (path, dtype)
+>>> big = big_wave(tmp.name)
+>>> load(big, out=numpy.empty((50, 6, 4), dtype='>f8'))
+Traceback (most recent call last):
+  ...
+ValueError: out must be a writeable, Fortran-contiguous array
+>>> load(big, out=numpy.empty((50, 6), dtype='>f8', order='F'))
+Traceback (most recent call last):
+  ...
+ValueError: cannot load >f8 wave data with shape (50, 6, 4) into a >f8 array with shape (50, 6)
+>>> load(os.path.join(DATA_DIR, 'win-textWave.ibw'),
+...      out=numpy.empty((10,), dtype='S8'))
+Traceback (most recent call last):
+  ...
+ValueError: cannot load text wave data into an out array
+
+A ``pool`` hands out arrays for the ``wData`` of numeric waves, and
+reuses released ones.  Text waves are loaded without it:
+
+>>> other = os.path.join(tmp.name, 'other.ibw')
+>>> write_wave(other, shape=(50, 6, 4), byte_order='>', start=1000)
+>>> pool = BufferPool()
+>>> for path in SAMPLE_PATHS + [big, other]:
+...     expected = load(path)
+...     check_wave(load(path, pool=pool), expected, path)
+...     with open(path, 'rb') as f:
+...         buffer = f.read()
+...     check_wave(loads(buffer, pool=pool), expected, path)
+>>> first = load(big, pool=pool)['wave']['wData']
+>>> pool.release(first)
+>>> second = load(other, pool=pool)
+>>> second['wave']['wData'] is first
+True
+>>> check_wave(second, load(other), other)
+
+Arrays that cannot be loaded into, like the read-only views returned
+by ``loads`` and memory maps, are not kept by the pool:
+
+>>> with open(big, 'rb') as f:
+...     view = loads(f.read())['wave']['wData']
+>>> mapped = load(big, mmap=True)['wave']['wData']
+>>> pool = BufferPool()
+>>> pool.release(view)
+>>> pool.release(mapped)
+>>> wData = load(big, pool=pool)['wave']['wData']
+>>> wData is view or wData is mapped
+False
+>>> check_wave(load(big, pool=pool), load(big), big)
+>>> del mapped
+>>> tmp.cleanup()
+"""
+
+import io
+import os.path
+import tempfile
+
+import numpy
+
+from igor.binarywave import load, loads
+from igor.util import BufferPool
+
+from helpers import (
+    DATA_DIR, SAMPLE_PATHS, big_wave, check_wave, same, sample_and_big_waves,
+    write_wave)
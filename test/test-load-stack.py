@@ -0,0 +1,74 @@
+# Copyright
+
+r"""Test stacking equal-length binary waves.
+
+``load_stack`` reads the data of 1D waves with the same length and
+type into the rows of a native array, in any mix of byte orders:
+
+>>> tmp = tempfile.TemporaryDirectory()
+>>> for i,order in enumerate('<>><'):
+...     write_wave(os.path.join(tmp.name, 'row{}.ibw'.format(i)), shape=(30,),
+...                byte_order=order, start=100 * i)
+>>> rows = [os.path.join(tmp.name, 'row{}.ibw'.format(i)) for i in range(4)]
+>>> singles = [os.path.join(DATA_DIR, f) for f in SAMPLE_FILES
+...            if 'version2' in f or 'version5' in f]
+>>> doubles = [os.path.join(DATA_DIR, f) for f in SAMPLE_FILES
+...            if 'double' in f]
+>>> big = big_wave(tmp.name)
+>>> for filenames in [rows, singles, doubles, rows[1:2]]:
+...     expected = [load(f)['wave']['wData'] for f in filenames]
+...     for threads in [None, 3]:
+...         stack = load_stack(filenames, threads=threads, verify=True)
+...         assert stack.dtype.isnative, stack.dtype
+...         assert stack.dtype == expected[0].dtype.newbyteorder('='), (
+...             stack.dtype)
+...         assert numpy.array_equal(stack, expected), (filenames, stack)
+>>> load_stack(singles).shape, load_stack(doubles).dtype == numpy.float64
+((4, 5), True)
+
+Streams, positioned at the start of their waves, may be mixed with
+paths:
+
+>>> streams = []
+>>> for i,path in enumerate(rows):
+...     with open(path, 'rb') as f:
+...         streams.append(io.BytesIO(b'x' * i + f.read()))
+...     _ = streams[-1].seek(i)
+>>> expected = [load(path)['wave']['wData'] for path in rows]
+>>> for threads in [None, 3]:
+...     for i,stream in enumerate(streams):
+...         _ = stream.seek(i)
+...     stack = load_stack(streams[:2] + rows[2:3] + streams[3:],
+...                        threads=threads)
+...     assert numpy.array_equal(stack, expected), stack
+
+Other waves are rejected:
+
+>>> for filenames in [[big], singles + doubles, rows + singles,
+...                   [os.path.join(DATA_DIR, 'mac-textWave.ibw')], []]:
+...     try:
+...         load_stack(filenames)
+...     except ValueError as e:
+...         print(str(e).replace(tmp.name, 'tmp').replace(DATA_DIR, 'data'))
+... # doctest: +NORMALIZE_WHITESPACE
+can only stack 1D numeric waves, not tmp/big.ibw (>f8 data with shape
+(50, 6, 4))
+cannot stack data/mac-double.ibw (>f8 data with shape (5,)) with
+data/mac-version2.ibw (>f4 data with shape (5,))
+cannot stack data/mac-version2.ibw (>f4 data with shape (5,)) with
+tmp/row0.ibw (float64 data with shape (30,))
+can only stack 1D numeric waves, not data/mac-textWave.ibw (|S1 data
+with shape (18,))
+no binary wave files to stack
+>>> tmp.cleanup()
+"""
+
+import io
+import os.path
+import tempfile
+
+import numpy
+
+from igor.binarywave import load, load_stack
+
+from helpers import DATA_DIR, SAMPLE_FILES, big_wave, write_wave
@@ -0,0 +1,26 @@
+# Copyright
+
+r"""Test memory-mapped binary wave loading against plain loads.
+
+With ``mmap=True``, numeric data is mapped read-only from the file,
+given a path or a file object:
+
+>>> tmp = tempfile.TemporaryDirectory()
+>>> for path,expected in sample_and_big_waves(tmp.name):
+...     check_wave(load(path, mmap=True), expected, path)
+...     with open(path, 'rb') as f:
+...         check_wave(load(f, mmap=True), expected, path)
+>>> wData = load(big_wave(tmp.name), mmap=True)['wave']['wData']
+>>> isinstance(wData, numpy.memmap), wData.flags.writeable, wData.shape
+(True, False, (50, 6, 4))
+>>> del wData
+>>> tmp.cleanup()
+"""
+
+import tempfile
+
+import numpy
+
+from igor.binarywave import load
+
+from helpers import big_wave, check_wave, sample_and_big_waves
@@ -0,0 +1,112 @@
+# Copyright
+
+r"""Test native byte order normalization against plain loads.
+
+With ``native=True``, numeric data is returned in native byte order.
+Writable buffers are swapped in place, other buffers are converted:
+
+>>> tmp = tempfile.TemporaryDirectory()
+>>> for path,expected in sample_and_big_waves(tmp.name):
+...     with open(path, 'rb') as f:
+...         buffer = f.read()
+...     check_wave(load(path, native=True), expected, path, native=True)
+...     check_wave(load(io.BytesIO(buffer), native=True), expected, path,
+...                native=True)
+...     check_wave(loads(buffer, native=True), expected, path, native=True)
+...     writable = bytearray(buffer)
+...     check_wave(loads(writable, native=True), expected, path, native=True)
+>>> writable == bytearray(buffer)
+False
+
+Large waves are swapped by several threads:
+
+>>> huge = os.path.join(tmp.name, 'huge.ibw')
+>>> write_wave(huge, shape=(200, 500, 4), byte_order='>', name=b'huge')
+>>> expected = load(huge)
+>>> with open(huge, 'rb') as f:
+...     buffer = f.read()
+>>> thread_size = binarywave.NATIVE_THREAD_SIZE
+>>> binarywave.NATIVE_THREAD_SIZE = 1 << 20
+>>> map_ = binarywave._map
+>>> threads = []
+>>> def count_threads(function, items, threads_=None):
+...     threads.append(threads_)
+...     return map_(function, items, threads_)
+>>> binarywave._map = count_threads
+>>> try:
+...     for loader in [lambda: load(huge, native=True),
+...                    lambda: loads(buffer, native=True),
+...                    lambda: loads(bytearray(buffer), native=True),
+...                    lambda: load(huge, native=True, pool=BufferPool())]:
+...         check_wave(loader(), expected, huge, native=True)
+... finally:
+...     binarywave.NATIVE_THREAD_SIZE = thread_size
+...     binarywave._map = map_
+>>> threads
+[3, 3, 3, 3]
+
+Packed experiments convert their wave data into new arrays, leaving
+the file's bytes in the records:
+
+>>> path = os.path.join(DATA_DIR, 'polar-graphs-demo.pxp')
+>>> check_records(packed.load(path, native=True), packed.load(path))
+>>> experiment = os.path.join(tmp.name, 'experiment.pxp')
+>>> write_experiment(experiment, [big_wave(tmp.name), huge, os.path.join(
+...     DATA_DIR, 'mac-version5.ibw')], byte_order='>')
+>>> expected = packed.load(experiment)
+>>> check_records(packed.load(experiment, native=True), expected)
+>>> with open(experiment, 'rb') as f:
+...     buffer = f.read()
+>>> writable = bytearray(buffer)
+>>> check_records(packed.loads(writable, native=True), expected)
+>>> writable == bytearray(buffer)
+True
+
+>>> tmp.cleanup()
+"""
+
+import io
+import os.path
+import struct
+import tempfile
+
+from igor import binarywave
+from igor import packed
+from igor.binarywave import load, loads
+from igor.record.wave import WaveRecord
+from igor.util import BufferPool
+
+from helpers import (
+    DATA_DIR, big_wave, check_wave, sample_and_big_waves, write_wave)
+
+
+def write_experiment(path, waves, byte_order):
+    """Save a packed experiment holding the binary wave files ``waves``
+
+    The waves should all use ``byte_order``.
+    """
+    with open(path, 'wb') as f:
+        for wave in waves:
+            with open(wave, 'rb') as w:
+                data = w.read()
+            f.write(struct.pack(byte_order + 'Hhl', 3, 1, len(data)))
+            f.write(data)
+
+
+def check_records(loaded, expected):
+    """Check that native packed records match plain ``expected`` ones.
+
+    The records' ``data`` must be unchanged.
+    """
+    records,filesystem = loaded
+    expected_records,expected_filesystem = expected
+    assert len(records) == len(expected_records), len(records)
+    waves = 0
+    for record,expected_record in zip(records, expected_records):
+        assert type(record) == type(expected_record), record
+        assert bytes(record.data) == bytes(expected_record.data), record
+        if isinstance(record, WaveRecord):
+            check_wave(record.wave, expected_record.wave, record, native=True)
+            waves += 1
+    assert waves, 'no wave records'
+    assert list(filesystem['root']) == list(expected_filesystem['root'])
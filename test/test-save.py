@@ -0,0 +1,145 @@
+# Copyright
+
+r"""Test saving binary waves.
+
+Saving a loaded version 2 or 5 sample wave in its own byte order
+writes the original file back, except for the version 2 padding after
+the data, which ``load`` drops.  Saving in either byte order gives a
+file with a valid checksum that loads back the same:
+
+>>> for path in SAVED_PATHS:
+...     with open(path, 'rb') as f:
+...         raw = f.read()
+...     wave = load(path)
+...     byte_order = load_header(path)['byte_order']
+...     for order in '<>':
+...         buffer = save_wave(wave, order)
+...         loaded = load(io.BytesIO(buffer), verify=True)
+...         check_round_trip(loaded, wave, (path, order))
+...         resaved = save_wave(loaded, byte_order)
+...         assert unpadded(resaved) == unpadded(raw), (path, order)
+...     assert unpadded(save_wave(wave, byte_order)) == unpadded(raw), path
+>>> len(SAVED_PATHS)
+10
+
+Multi-dimensional waves keep their shape, units, labels, note and
+formula:
+
+>>> wData = numpy.arange(24, dtype='<i4').reshape((3, 4, 2), order='F')
+>>> wave = {'version': 5, 'wave': {
+...     'wave_header': {'bname': b'multi', 'dimUnits': [b's', b'Hz']},
+...     'wData': wData,
+...     'note': b'a note',
+...     'formula': b'x+1',
+...     'data_units': b'millivolts',
+...     'dimension_units': [b'seconds', b'', b'kilohertz'],
+...     'labels': [[b'rows', b'r0', b'r1', b'r2'],
+...                [b'', b'c0', b'c1', b'c2', b'c3']],
+...     }}
+>>> for order in '<>':
+...     buffer = save_wave(wave, order)
+...     loaded = load(io.BytesIO(buffer), verify=True)
+...     assert save_wave(loaded, order) == buffer, order
+...     loaded = loaded['wave']
+...     assert loaded['wData'].shape == (3, 4, 2), loaded['wData'].shape
+...     assert numpy.array_equal(loaded['wData'], wData), loaded['wData']
+...     header = loaded['wave_header']
+...     print(order, header['nDim'].tolist(),
+...           [b''.join(units) for units in header['dimUnits'].tolist()])
+...     print(loaded['note'], loaded['formula'], loaded['data_units'])
+...     print(loaded['dimension_units'],
+...           loaded['bin_header']['dimEUnitsSize'].tolist())
+...     print(loaded['labels'])
+< [3, 4, 2, 0] [b's', b'Hz', b'', b'']
+b'a note' b'x+1' b'millivolts'
+b'secondskilohertz' [7, 0, 9, 0]
+[[b'rows', b'r0', b'r1', b'r2'], [b'', b'c0', b'c1', b'c2', b'c3'], [], []]
+> [3, 4, 2, 0] [b's', b'Hz', b'', b'']
+b'a note' b'x+1' b'millivolts'
+b'secondskilohertz' [7, 0, 9, 0]
+[[b'rows', b'r0', b'r1', b'r2'], [b'', b'c0', b'c1', b'c2', b'c3'], [], []]
+
+Igor reads a zero in ``nDim`` as the end of the dimensions, so empty
+waves must be one-dimensional:
+
+>>> load(io.BytesIO(save_wave(
+...     {'wave': {'wave_header': {'bname': b'empty'},
+...               'wData': numpy.zeros(0)}}, '<')))['wave']['wData'].shape
+(0,)
+>>> for shape in [(0, 3), (3, 0)]:
+...     try:
+...         save_wave({'wave': {'wave_header': {'bname': b'empty'},
+...                             'wData': numpy.zeros(shape)}}, '<')
+...     except ValueError as e:
+...         print(e)
+multi-dimensional waves cannot have empty dimensions, not (0, 3)
+multi-dimensional waves cannot have empty dimensions, not (3, 0)
+
+Igor stores wave data in column-major order, and text waves are no
+exception.  A two-dimensional text wave saves its strings down the
+columns and loads back with the same shape and layout:
+
+>>> strings = numpy.array([[b'a', b'bcd', b''], [b'efgh', b'i', b'jk']])
+>>> for byte_order in '<>':
+...     buffer = save_text_wave(strings, byte_order)
+...     lazy = load(io.BytesIO(buffer), text='lazy')['wave']['wData']
+...     assert list(lazy) == [b'a', b'efgh', b'bcd', b'i', b'', b'jk'], (
+...         byte_order, list(lazy))
+...     for text in TEXT_FORMATS:
+...         wData = load(io.BytesIO(buffer), text=text)['wave']['wData']
+...         if text == 'lazy':
+...             wData = wData.to_array()
+...         assert wData.shape == strings.shape, (text, wData.shape)
+...         assert wData.tolist() == strings.tolist(), (text, wData)
+"""
+
+import io
+
+import numpy
+
+from igor.binarywave import TEXT_FORMATS, load, load_header, save
+
+from helpers import SAMPLE_PATHS, same
+
+
+SAVED_PATHS = [path for path in SAMPLE_PATHS if 'version3' not in path]
+
+
+def save_wave(wave, byte_order):
+    "Return the bytes of ``wave`` saved in ``byte_order``"
+    stream = io.BytesIO()
+    save(stream, wave, byte_order=byte_order)
+    return stream.getvalue()
+
+
+def unpadded(buffer):
+    "Zero the padding after the data of a version 2 wave"
+    header = load_header(io.BytesIO(buffer))
+    if header['version'] != 2:
+        return buffer
+    end = header['data_offset'] + header['data_size']
+    return buffer[:end] + bytes(bytearray(16)) + buffer[end+16:]
+
+
+def check_round_trip(loaded, wave, label):
+    "Check that two loaded waves match, apart from their byte order"
+    assert loaded['version'] == wave['version'], label
+    for key in sorted(set(loaded['wave']) | set(wave['wave'])):
+        a = loaded['wave'][key]
+        b = wave['wave'][key]
+        if key == 'bin_header':  # the checksum depends on the byte order
+            a = dict(a, checksum=None)
+            b = dict(b, checksum=None)
+        elif key == 'wData':
+            assert (a.dtype.newbyteorder('=') ==
+                    b.dtype.newbyteorder('=')), (label, a.dtype, b.dtype)
+        assert same(a, b), (label, key, a, b)
+
+
+def save_text_wave(strings, byte_order):
+    "Return the bytes of a version 5 text wave holding ``strings``"
+    stream = io.BytesIO()
+    save(stream, {'version': 5, 'wave': {
+                'wave_header': {'bname': b'text0'}, 'wData': strings}},
+         byte_order=byte_order)
+    return stream.getvalue()
@@ -0,0 +1,48 @@
+# Copyright
+
+r"""Test loading multi-dimensional text waves.
+
+Igor stores wave data in column-major order, and text waves are no
+exception.  Changing the dimensions of a one-dimensional text wave
+from six rows to two rows and three columns puts the strings down the
+columns:
+
+>>> strings = [b'a', b'bcd', b'', b'efgh', b'i', b'jk']
+>>> for byte_order in '<>':
+...     buffer = reshape_text_wave(strings, (2, 3), byte_order)
+...     for text in TEXT_FORMATS:
+...         wData = loads(buffer, text=text)['wave']['wData']
+...         if text == 'lazy':
+...             assert list(wData) == strings, (byte_order, list(wData))
+...             wData = wData.to_array()
+...         assert wData.tolist() == [
+...             [b'a', b'', b'i'], [b'bcd', b'efgh', b'jk']], (text, wData)
+"""
+
+import io
+import struct
+
+import numpy
+
+from igor.binarywave import (
+    BinHeader5, MAXDIMS, TEXT_FORMATS, WaveHeader5, loads, save)
+
+
+def reshape_text_wave(strings, shape, byte_order):
+    """Return a version 5 text wave holding ``strings`` with ``shape``.
+
+    The strings are saved in a one-dimensional wave, which keeps them
+    in the given order, and then the wave's ``nDim`` is overwritten.
+    """
+    stream = io.BytesIO()
+    save(stream, {'version': 5, 'wave': {
+                'wave_header': {'bname': b'text0'},
+                'wData': numpy.array(strings, dtype=object)}},
+         byte_order=byte_order)
+    buffer = bytearray(stream.getvalue())
+    offset = 2 + BinHeader5.for_order(byte_order).size + (
+        WaveHeader5.for_order(byte_order).field_offsets['nDim'][0])
+    nDim = list(shape) + [0] * (MAXDIMS - len(shape))
+    struct.pack_into(
+        '{}{}l'.format(byte_order, MAXDIMS), buffer, offset, *nDim)
+    return bytes(buffer)
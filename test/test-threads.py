@@ -0,0 +1,124 @@
+# Copyright
+
+r"""Test concurrent loading of the sample files.
+
+The structure definitions are shared between threads, so loading the
+same files from many threads at once should give the same results as
+loading them one at a time.  Lazy loads build per-structure field
+layouts on first use, so they run first, while those are still
+missing (and slow to build), and must all return lazy headers:
+
+>>> with slow_layouts():
+...     results = load_concurrently(threads=16, repeats=2, load=load_lazy)
+>>> expected = load_all()
+>>> lazy_expected = [result for result,kind in zip(expected, kinds())
+...                  if kind == 'wave']
+>>> [i for i,result in enumerate(results) if result != lazy_expected]
+[]
+
+Plain loads give the same results as loading one file at a time:
+
+>>> results = load_concurrently(threads=8, repeats=4)
+>>> len(results)
+32
+>>> [i for i,result in enumerate(results) if result != expected]
+[]
+"""
+
+import contextlib
+import os
+import os.path
+import time
+from multiprocessing.pool import ThreadPool
+from pprint import pformat
+
+from igor import LOG
+from igor.binarywave import load as loadibw
+from igor.packed import load as loadpxp
+from igor.record.base import TextRecord
+from igor.record.variables import VariablesRecord
+from igor.record.wave import WaveRecord
+from igor.struct import LazyStructureData, Structure
+
+
+_this_dir = os.path.dirname(__file__)
+_data_dir = os.path.join(_this_dir, 'data')
+
+def load_all(_=None):
+    LOG.info('Testing concurrent loading\n')
+    results = []
+    for filename in sorted(os.listdir(_data_dir)):
+        path = os.path.join(_data_dir, filename)
+        if filename.endswith('.ibw'):
+            results.append(pformat(loadibw(path)))
+        elif filename.endswith('.pxp'):
+            records,filesystem = loadpxp(path)
+            for record in records:
+                results.append(pformat(record_data(record)))
+    return results
+
+def load_lazy(_=None):
+    "Load the sample waves with ``lazy=True``, in ``load_all`` order"
+    results = []
+    for filename in sorted(os.listdir(_data_dir)):
+        path = os.path.join(_data_dir, filename)
+        if filename.endswith('.ibw'):
+            results.append(pformat(lazy_wave_data(loadibw(path, lazy=True))))
+        elif filename.endswith('.pxp'):
+            records,filesystem = loadpxp(path, lazy=True)
+            for record in records:
+                if isinstance(record, WaveRecord):
+                    results.append(pformat(lazy_wave_data(record.wave)))
+    return results
+
+def lazy_wave_data(wave):
+    "Convert the lazy headers of ``wave`` to dicts"
+    data = dict(wave['wave'])
+    for key in ['bin_header', 'wave_header']:
+        if not isinstance(data[key], LazyStructureData):
+            return 'non-lazy {}'.format(key)
+        data[key] = dict(data[key])
+    return dict(wave, wave=data)
+
+def kinds():
+    "Return 'wave' or 'other' for each of the ``load_all`` results"
+    kinds = []
+    for filename in sorted(os.listdir(_data_dir)):
+        path = os.path.join(_data_dir, filename)
+        if filename.endswith('.ibw'):
+            kinds.append('wave')
+        elif filename.endswith('.pxp'):
+            records,filesystem = loadpxp(path)
+            kinds.extend('wave' if isinstance(record, WaveRecord) else 'other'
+                         for record in records)
+    return kinds
+
+def record_data(record):
+    if isinstance(record, TextRecord):
+        return record.text
+    elif isinstance(record, VariablesRecord):
+        return record.variables
+    elif isinstance(record, WaveRecord):
+        return record.wave
+    return record.data
+
+def load_concurrently(threads, repeats, load=load_all):
+    pool = ThreadPool(threads)
+    try:
+        return pool.map(load, range(threads * repeats))
+    finally:
+        pool.close()
+        pool.join()
+
+@contextlib.contextmanager
+def slow_layouts(delay=1e-4):
+    "Slow down building lazy field layouts, to widen any race windows"
+    field_size = Structure._field_size
+    def slow_field_size(self, field):
+        time.sleep(delay)
+        return field_size(self, field)
+    Structure._field_size = slow_field_size
+    try:
+        yield
+    finally:
+        Structure._field_size = field_size
@@ -0,0 +1,70 @@
+# Copyright
+
+r"""Test header checksum verification.
+
+With ``verify=True``, the header checksum is checked before the wave
+is loaded:
+
+>>> tmp = tempfile.TemporaryDirectory()
+>>> for path,expected in sample_and_big_waves(tmp.name):
+...     check_wave(load(path, verify=True), expected, path)
+...     check_wave(load(path, mmap=True, verify=True), expected, path)
+...     with open(path, 'rb') as f:
+...         check_wave(loads(f.read(), verify=True), expected, path)
+
+and a corrupted header is rejected, however the wave is loaded:
+
+>>> with open(big_wave(tmp.name), 'rb') as f:
+...     buffer = bytearray(f.read())
+>>> buffer[100] ^= 1
+>>> corrupt = os.path.join(tmp.name, 'corrupt.ibw')
+>>> with open(corrupt, 'wb') as f:
+...     _ = f.write(buffer)
+>>> for loader in [lambda: load(corrupt, verify=True),
+...                lambda: load(corrupt, mmap=True, verify=True),
+...                lambda: load(io.BytesIO(buffer), verify=True),
+...                lambda: loads(buffer, verify=True),
+...                lambda: load_header(corrupt, verify=True)]:
+...     try:
+...         loader()
+...     except ValueError as e:
+...         print(e)
+... # doctest: +NORMALIZE_WHITESPACE
+This does not appear to be a valid Igor binary wave file.  Error in
+checksum: should be 0, is 256.
+This does not appear to be a valid Igor binary wave file.  Error in
+checksum: should be 0, is 256.
+This does not appear to be a valid Igor binary wave file.  Error in
+checksum: should be 0, is 256.
+This does not appear to be a valid Igor binary wave file.  Error in
+checksum: should be 0, is 256.
+This does not appear to be a valid Igor binary wave file.  Error in
+checksum: should be 0, is 256.
+>>> load(corrupt)['wave']['wave_header']['bname'] == b'wave0'
+True
+
+as are truncated waves:
+
+>>> for truncated in [b'', buffer[:1], buffer[:100]]:
+...     for loader in [lambda: load(io.BytesIO(truncated), verify=True),
+...                    lambda: loads(truncated, verify=True)]:
+...         try:
+...             loader()
+...         except ValueError as e:
+...             print(e)
+unexpected end of binary wave file (0 of 2 bytes)
+unexpected end of binary wave file (0 of 2 bytes)
+unexpected end of binary wave file (1 of 2 bytes)
+unexpected end of binary wave file (1 of 2 bytes)
+unexpected end of binary wave file (100 of 384 bytes)
+unexpected end of binary wave file (100 of 384 bytes)
+>>> tmp.cleanup()
+"""
+
+import io
+import os.path
+import tempfile
+
+from igor.binarywave import load, load_header, loads
+
+from helpers import big_wave, check_wave, sample_and_big_waves